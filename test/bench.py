@@ -0,0 +1,316 @@
+# Мерења перформанси конвертора
+# Свако мерење генерише синтетичке документе у привременом директоријуму
+#
+# Покретање:
+#   python test/bench.py fast-load      # учитавање докумената са много слика
+#   python test/bench.py row-store      # меморија складишта редова на великом документу
+#   python test/bench.py converter      # кашњење по документу за мале документе
+#   python test/bench.py parallel       # паралелно извлачење великог документа по броју процеса
+#   python test/bench.py filters        # филтери извлачења на документу са много пасуса
+#   python test/bench.py compression    # време чувања и величина .xlsx по нивоу компресије
+import argparse
+import io
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import zlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import docx
+from docx.shared import Inches
+import w2e
+
+from golden import _fill_table
+
+# Функција која генерише PNG слику са шумом (не може се компресовати)
+def noise_png(width, height, seed):
+    rng = random.Random(seed)
+    raw = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+# Функција која генерише документ са табелама и сликама (скенови, логотипи)
+def make_image_document(path, images, tables=4, rows=40, size=800):
+    document = docx.Document()
+    for t in range(tables):
+        document.add_paragraph(f"Извод {t}")
+        table = document.add_table(rows=rows, cols=4)
+        _fill_table(table, rows, t)
+    for i in range(images):
+        document.add_picture(io.BytesIO(noise_png(size, size, i)), width=Inches(2))
+    document.save(path)
+
+# Функција која мери најбоље време и вршну меморију позива
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+# Мерење брзог учитавања: пун пакет наспрам пакета без слика и неповезаних делова
+def bench_fast_load(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'слика':>6} {'MB':>7} {'пуно с':>9} {'брзо с':>9} {'пуно MB':>9} {'брзо MB':>9}")
+        for images in (0, 5, 20, 50):
+            path = Path(tmp) / f"images_{images}.docx"
+            make_image_document(path, images)
+            full_time, full_peak = measure(lambda: w2e.load_document(path), args.repeat)
+            fast_time, fast_peak = measure(lambda: w2e.load_document(path, fast_load=True), args.repeat)
+            # Излаз мора бити исти без обзира на начин учитавања
+            assert (list(w2e.extract_rows(w2e.load_document(path))) ==
+                    list(w2e.extract_rows(w2e.load_document(path, fast_load=True))))
+            print(f"{images:6} {path.stat().st_size / 2**20:7.1f} {full_time:9.3f} {fast_time:9.3f} "
+                  f"{full_peak:9.1f} {fast_peak:9.1f}")
+
+# Функција која генерише велики документ са табелама и пасусима
+def make_large_document(path, tables=4, rows=2500):
+    document = docx.Document()
+    for t in range(tables):
+        for p in range(20):
+            document.add_paragraph(f"Пасус {t}.{p} – извод по рачуну")
+        table = document.add_table(rows=rows, cols=4)
+        _fill_table(table, rows, t)
+    document.save(path)
+
+# Функција која мери меморију задржану после позива (tracemalloc)
+def retained(build):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, (after - before) / (1024 * 1024)
+
+# Мерење складишта редова: паралелне листе листа наспрам RowStore
+# Оба облика се граде из истих извучених редова, па су саме вредности заједничке
+# и мери се само цена структуре (листе, ознаке подебљања и врсте реда)
+def bench_row_store(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'large.docx'
+        make_large_document(path, rows=args.rows)
+        extracted = list(w2e.extract_rows(w2e.load_document(path)))
+
+    def build_lists():
+        rows, is_bold_format, is_table = [], [], []
+        for row_data, row_format, _, _ in extracted:
+            rows.append(list(row_data))
+            is_bold_format.append(list(row_format))
+        for row in rows:
+            is_table.append(len(row) > 1)
+        return rows, is_bold_format, is_table
+
+    def build_store():
+        store = w2e.RowStore()
+        for row_data, row_format, kind, table in extracted:
+            store.append(row_data, row_format, kind, table)
+        return store
+
+    lists, lists_mb = retained(build_lists)
+    store, store_mb = retained(build_store)
+    assert list(store) == lists[0]
+    assert [store.bolds(i) for i in range(len(store))] == lists[1]
+    cells = len(store.values)
+    print(f"редова: {len(store)}, ћелија: {cells}")
+    print(f"листе листа: {lists_mb:8.2f} MB ({lists_mb * 2**20 / cells:6.1f} B/ћелији)")
+    print(f"RowStore:    {store_mb:8.2f} MB ({store_mb * 2**20 / cells:6.1f} B/ћелији)")
+
+# Функција која генерише мали документ (неколико пасуса и кратка табела)
+def make_small_document(path, seed):
+    document = docx.Document()
+    for p in range(3):
+        document.add_paragraph(f"Пасус {seed}.{p} – извод по рачуну")
+    table = document.add_table(rows=6 + seed % 5, cols=4)
+    _fill_table(table, len(table.rows), seed)
+    document.save(path)
+
+# Мерење кашњења по документу: нов конвертор (и кеш стилова) за сваки документ
+# наспрам једног конвертора подешеног једном и коришћеног за све документе
+def bench_converter(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for seed in range(args.documents):
+            path = Path(tmp) / f"small_{seed}.docx"
+            make_small_document(path, seed)
+            sources.append(path.read_bytes())
+
+    def latencies(convert):
+        times = []
+        for _ in range(args.repeat):
+            for data in sources:
+                started = time.perf_counter()
+                assert convert(data) is not None
+                times.append(time.perf_counter() - started)
+        return times
+
+    shared = w2e.Converter()
+    fresh = lambda data: w2e.Converter(style_cache=w2e.StyleCache()).convert(data)
+    # Загревање (увоз модула и први позиви)
+    fresh(sources[0])
+    shared.convert(sources[0])
+    print(f"докумената: {len(sources)}, понављања: {args.repeat}")
+    print(f"{'':20} {'медијана ms':>12} {'p95 ms':>8} {'док./с':>8}")
+    for name, convert in (('нов конвертор', fresh), ('поновна употреба', shared.convert)):
+        times = sorted(latencies(convert))
+        p95 = times[int(len(times) * 0.95) - 1]
+        print(f"{name:20} {statistics.median(times) * 1000:12.1f} {p95 * 1000:8.1f} "
+              f"{len(times) / sum(times):8.1f}")
+
+# Мерење паралелног извлачења: време read_rows и убрзање у односу на секвенцијално
+# извлачење за 1, 2, 4, ... процеса до броја језгара; излаз мора бити исти
+def bench_parallel(args):
+    cores = os.cpu_count() or 1
+    jobs_list = [1]
+    while jobs_list[-1] * 2 <= max(cores, 2):
+        jobs_list.append(jobs_list[-1] * 2)
+    if cores not in jobs_list:
+        jobs_list.append(cores)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'report.docx'
+        make_large_document(path, tables=args.tables, rows=args.rows)
+        serial = w2e.read_rows(path)
+        print(f"језгара: {cores}, табела: {args.tables}, редова: {len(serial)}")
+        print(f"{'процеса':>8} {'с':>8} {'убрзање':>8}")
+        baseline = None
+        for jobs in jobs_list:
+            seconds = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                store = w2e.read_rows(path, jobs=jobs)
+                elapsed = time.perf_counter() - started
+                seconds = elapsed if seconds is None else min(seconds, elapsed)
+            assert (list(store) == list(serial) and store.kinds == serial.kinds
+                    and store.bold_bits == serial.bold_bits)
+            baseline = baseline or seconds
+            print(f"{jobs:8} {seconds:8.3f} {baseline / seconds:7.2f}x")
+
+# Функција која генерише документ са много пасуса и малим бројем табела
+def make_paragraph_document(path, tables=5, rows=40, paragraphs=1000):
+    document = docx.Document()
+    for t in range(tables):
+        for p in range(paragraphs):
+            run = document.add_paragraph().add_run(f"Пасус {t}.{p} – образложење ставки извода")
+            run.bold = p % 5 == 0
+        table = document.add_table(rows=rows, cols=4)
+        _fill_table(table, rows, t)
+    document.save(path)
+
+# Мерење филтера извлачења: цео документ наспрам само табела, једне табеле и износа
+def bench_filters(args):
+    filters = {
+        'цео документ': None,
+        'само табеле': w2e.RowFilter(tables_only=True),
+        'табела 1': w2e.RowFilter(tables={0}),
+        'само износи': w2e.RowFilter(amounts=True),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'paragraphs.docx'
+        make_paragraph_document(path, tables=args.tables, paragraphs=args.paragraphs)
+        doc = w2e.load_document(path)
+        print(f"пасуса: {args.paragraphs * args.tables}, табела: {args.tables}")
+        print(f"{'филтер':14} {'редова':>7} {'извлачење с':>12} {'конверзија с':>13}")
+        for name, row_filter in filters.items():
+            rows = list(w2e.extract_rows(doc, row_filter=row_filter))
+            extract_time, _ = measure(lambda: list(w2e.extract_rows(doc, row_filter=row_filter)),
+                                      args.repeat)
+            converter = w2e.Converter(row_filter=row_filter)
+            convert_time, _ = measure(lambda: converter.convert(path), args.repeat)
+            print(f"{name:14} {len(rows):7} {extract_time:12.3f} {convert_time:13.3f}")
+
+# Профилер који бележи само трајање фаза уписа (workbook, save)
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+        self._stage = None
+    
+    def mark(self, stage):
+        now = time.perf_counter()
+        if self._stage:
+            self.seconds[self._stage] = now - self._started
+        self._stage, self._started = stage, now
+    
+    def finish(self):
+        self.mark(None)
+
+# Функција која враћа распаковане делове .xlsx пакета без мета-података о времену
+def package_parts(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if name != 'docProps/core.xml'}
+
+# Мерење нивоа компресије: време чувања и величина .xlsx датотеке великог документа;
+# садржај пакета мора бити исти на сваком нивоу
+def bench_compression(args):
+    levels = {'подразумевано': None, 'без (0)': 0, '1': 1, '3': 3, '6': 6, '9': 9}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'report.docx'
+        make_large_document(path, tables=args.tables, rows=args.rows)
+        store = w2e.read_rows(path)
+        print(f"редова: {len(store)}")
+        print(f"{'компресија':14} {'чување с':>9} {'упис с':>8} {'MB':>7} {'однос':>7}")
+        expected = None
+        for name, level in levels.items():
+            converter = w2e.Converter(compresslevel=level)
+            save_time = write_time = None
+            for _ in range(args.repeat):
+                buffer = io.BytesIO()
+                timer = StageTimer()
+                started = time.perf_counter()
+                assert converter.write(store, buffer, timer)
+                elapsed = time.perf_counter() - started
+                write_time = elapsed if write_time is None else min(write_time, elapsed)
+                save = timer.seconds['save']
+                save_time = save if save_time is None else min(save_time, save)
+            data = buffer.getvalue()
+            parts = package_parts(data)
+            expected = expected or parts
+            assert parts == expected
+            raw = sum(len(part) for part in parts.values())
+            print(f"{name:14} {save_time:9.3f} {write_time:8.3f} {len(data) / (1024 * 1024):7.2f} "
+                  f"{len(data) / raw:7.1%}")
+
+BENCHMARKS = {
+    'fast-load': bench_fast_load,
+    'row-store': bench_row_store,
+    'converter': bench_converter,
+    'parallel': bench_parallel,
+    'filters': bench_filters,
+    'compression': bench_compression,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Мерења перформанси конвертора')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3, help='број понављања (узима се најбоље)')
+    parser.add_argument('--rows', type=int, default=2500, help='број редова по табели великог документа')
+    parser.add_argument('--documents', type=int, default=50, help='број малих докумената')
+    parser.add_argument('--tables', type=int, default=4, help='број табела великог документа')
+    parser.add_argument('--paragraphs', type=int, default=1000,
+                        help='број пасуса испред сваке табеле (filters)')
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == '__main__':
+    main()
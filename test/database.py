@@ -0,0 +1,140 @@
+# Тест SQLite базе извучених ћелија (--sqlite, --search)
+# Уноси документе корпуса, поново уноси документ под истим именом, прекида унос
+# грешком у пола документа и проверава ћелије, замену и претрагу (FTS5 и LIKE)
+# после поновног отварања базе, као и превођење базе старије шеме
+#
+# Покретање:
+#   python test/database.py
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import w2e
+
+from golden import FIXTURES_DIR, make_fixtures
+
+# Функција која враћа ћелије документа из базе у облику записа RowDatabase.cell_records
+def document_cells(path, name):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            "SELECT c.row, c.table_idx, c.table_row, c.col, c.bold, c.text, c.amount "
+            "FROM cells c JOIN documents d ON d.id = c.document WHERE d.file = ? "
+            "ORDER BY c.row, c.col", (name,)).fetchall()
+
+# Функција која упоређује ћелије документа у бази са складиштем редова
+def check_document(path, name, store):
+    expected = [record[1:] for record in w2e.RowDatabase.cell_records(None, store)]
+    actual = document_cells(path, name)
+    if actual != expected:
+        return f"{name}: {len(actual)} ћелија у бази, очекивано {len(expected)}"
+    return None
+
+# Функција која проверава да претрага налази тачно задату ћелију документа
+def check_search(database, query, name, store):
+    records = [record for record in w2e.RowDatabase.cell_records(None, store)
+               if record[6] == query]
+    if not records:
+        return f"„{query}“ није у документу"
+    _, row, _, _, col, _, text, amount = records[0]
+    found = [match for match in database.search(query) if match[0] == name]
+    if (name, row, col, text, amount) not in found:
+        return f"„{query}“: {found}"
+    return None
+
+def main():
+    make_fixtures()
+    stores = {path.name: w2e.read_rows(path) for path in sorted(FIXTURES_DIR.glob('*.docx'))}
+    basic, multi = stores['basic.docx'], stores['multi_table.docx']
+    failures = []
+
+    def step(name, error):
+        print(f"{name:40} {error or 'у реду'}")
+        if error:
+            failures.append(f"{name}: {error}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cells.db'
+
+        # Унос свих докумената корпуса
+        database = w2e.RowDatabase(path)
+        for name, store in stores.items():
+            database.add(name, store, f"{Path(name).stem}.xlsx")
+        database.close()
+        step('унос', next(filter(None, (check_document(path, name, store)
+                                        for name, store in stores.items())), None))
+        with sqlite3.connect(path) as connection:
+            tables = connection.execute(
+                "SELECT min(c.table_idx), max(c.table_idx) FROM cells c "
+                "JOIN documents d ON d.id = c.document WHERE d.file = 'multi_table.docx'").fetchone()
+        step('табеле бројане од 1', tables != (1, 6) and f"табеле {tables}, очекивано (1, 6)")
+
+        # База старије шеме (табеле бројане од 0) се преводи при отварању
+        with sqlite3.connect(path) as connection:
+            connection.execute("UPDATE cells SET table_idx = table_idx - 1")
+            connection.execute("PRAGMA user_version = 0")
+        w2e.RowDatabase(path).close()
+        w2e.RowDatabase(path).close()
+        step('превођење старе шеме', next(filter(None, (check_document(path, name, store)
+                                                        for name, store in stores.items())), None))
+
+        # Поновни унос под истим именом замењује ћелије и индекс претраге
+        database = w2e.RowDatabase(path)
+        database.add('basic.docx', multi)
+        old_text = 'Пасус 0.2 – извод по рачуну'
+        error = check_search(database, 'Пасус 1.1 – извод по рачуну', 'basic.docx', multi)
+        if not error and any(match[0] == 'basic.docx' for match in database.search(old_text)):
+            error = f"стари текст „{old_text}“ је и даље у индексу"
+        database.close()
+        error = error or check_document(path, 'basic.docx', multi)
+        with sqlite3.connect(path) as connection:
+            documents = connection.execute("SELECT count(*) FROM documents").fetchone()[0]
+        step('замена при поновном уносу', error or
+             (documents != len(stores) and f"{documents} докумената, очекивано {len(stores)}"))
+
+        # Претрага броја рачуна (фраза са цртицама) кроз FTS5 и кроз LIKE без FTS5
+        database = w2e.RowDatabase(path)
+        account = '160-100039-00'
+        error = check_search(database, account, 'multi_table.docx', multi)
+        database.fts = False
+        error = error or check_search(database, account, 'multi_table.docx', multi)
+        database.close()
+        step('претрага', error)
+
+        # Грешка у пола документа: одбацује се само тај документ, претходни унос остаје
+        database = w2e.RowDatabase(path)
+        database.add('large_table.docx', basic)
+        records = w2e.RowDatabase.cell_records
+        def failing(document_id, store):
+            for idx, record in enumerate(records(document_id, store)):
+                if idx == 100:
+                    raise sqlite3.OperationalError('disk I/O error')
+                yield record
+        database.BATCH = 10
+        database.cell_records = failing
+        try:
+            database.add('multi_table.docx', stores['large_table.docx'])
+            error = 'грешка није пријављена'
+        except sqlite3.OperationalError:
+            error = None
+        database.close()
+        database = w2e.RowDatabase(path)
+        error = (error or check_document(path, 'multi_table.docx', multi) or
+                 check_document(path, 'large_table.docx', basic) or
+                 check_search(database, account, 'multi_table.docx', multi))
+        database.close()
+        step('враћање документа после грешке', error)
+
+    if failures:
+        print('\nНеуспешне провере:')
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print('\nСве провере су прошле.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
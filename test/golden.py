@@ -0,0 +1,269 @@
+# Регресиони тест излаза са буџетима перформанси
+# Конвертује корпус докумената и семантички упоређује добијене Excel датотеке
+# са сачуваним еталонима (вредности, подебљање, формати бројева, распоред редова),
+# а затим проверава време и вршну меморију по документу према датотеци буџета
+#
+# Покретање:
+#   python test/golden.py                  # провера
+#   python test/golden.py --update         # поновно генерисање еталона
+#   python test/golden.py --update-budgets # мерење и упис нових буџета
+#   python test/golden.py --jobs 4         # провера паралелног извлачења
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import docx
+import openpyxl
+import w2e
+
+HERE = Path(__file__).resolve().parent
+FIXTURES_DIR = HERE / 'fixtures'
+GOLDEN_DIR = HERE / 'golden'
+BUDGETS_FILE = HERE / 'budgets.json'
+
+# Резерва која се додаје измереним вредностима при упису буџета
+BUDGET_HEADROOM = 2.0
+# Најмањи буџети како кратке конверзије не би биле осетљиве на шум
+MIN_SECONDS = 0.5
+MIN_PEAK_MB = 5.0
+
+# Функција која попуњава табелу редовима са именима, износима и рачунима
+def _fill_table(table, rows, seed):
+    for i, row in enumerate(table.rows):
+        cells = row.cells
+        cells[0].text = str(i + 1)
+        cells[1].text = f"Име Презиме {seed}-{i} {1000 + (i * 37 + seed) % 9000}"
+        if i % 7 == 3:
+            cells[2].text = 'није унето'
+        elif i % 2:
+            cells[2].text = f"{(i * 7919 + seed) % 1000}.{(i * 31) % 1000:03d},{i % 100:02d}"
+        else:
+            cells[2].text = f"{(i * 104729 + seed) % 100000}.{i % 100:02d}"
+        cells[3].text = f"160-{100000 + i * 13}-{seed:02d}"
+    for cell in table.rows[0].cells:
+        for paragraph in cell.paragraphs:
+            for run in paragraph.runs:
+                run.bold = True
+
+# Функција која генерише синтетички корпус докумената ако не постоји
+# Садржај је детерминистички, тако да еталони остају важећи
+def make_fixtures(directory=FIXTURES_DIR):
+    directory.mkdir(parents=True, exist_ok=True)
+    specs = {
+        'basic.docx': dict(tables=1, rows=8, paragraphs=3),
+        'multi_table.docx': dict(tables=6, rows=12, paragraphs=2),
+        'paragraphs_only.docx': dict(tables=0, rows=0, paragraphs=40),
+        'large_table.docx': dict(tables=2, rows=400, paragraphs=1),
+    }
+    for name, spec in specs.items():
+        path = directory / name
+        if path.exists():
+            continue
+        document = docx.Document()
+        for t in range(max(spec['tables'], 1)):
+            for p in range(spec['paragraphs']):
+                paragraph = document.add_paragraph()
+                run = paragraph.add_run(f"Пасус {t}.{p} – извод по рачуну")
+                run.bold = p % 2 == 0
+            if spec['tables']:
+                table = document.add_table(rows=spec['rows'], cols=4)
+                _fill_table(table, spec['rows'], t)
+        document.save(path)
+
+    # Документ са спојеним ћелијама и празним редовима
+    path = directory / 'merged_cells.docx'
+    if not path.exists():
+        document = docx.Document()
+        document.add_paragraph('Спојене ћелије')
+        table = document.add_table(rows=6, cols=4)
+        _fill_table(table, 6, 7)
+        table.cell(2, 0).merge(table.cell(2, 1))
+        table.cell(3, 3).merge(table.cell(4, 3))
+        for cell in table.rows[5].cells:
+            cell.text = ''
+        document.add_paragraph('')
+        document.add_paragraph('Крај')
+        document.save(path)
+
+    # Документ у ком подебљање долази из стилова пасуса у ћелијама
+    path = directory / 'styled_cells.docx'
+    if not path.exists():
+        document = docx.Document()
+        document.add_paragraph('Наслов извода', style='Heading 1')
+        document.add_paragraph('Обичан пасус', style='Body Text')
+        table = document.add_table(rows=5, cols=4)
+        _fill_table(table, 5, 3)
+        for i, row in enumerate(table.rows):
+            for cell in row.cells:
+                cell.paragraphs[0].style = ('Normal', 'Heading 2', 'Title', 'Heading 1', 'List Bullet')[i]
+        document.save(path)
+
+    # Документ са табелама угњежденим у ћелије (до три нивоа)
+    path = directory / 'nested_tables.docx'
+    if not path.exists():
+        document = docx.Document()
+        document.add_paragraph('Угњеждене табеле')
+        table = document.add_table(rows=4, cols=4)
+        _fill_table(table, 4, 5)
+        cell = table.cell(1, 1)
+        inner = cell.add_table(rows=2, cols=2)
+        for i, row in enumerate(inner.rows):
+            row.cells[0].text = f"Подрачун {i}"
+            row.cells[1].text = f"{i + 1}.250,00"
+        inner.cell(0, 0).paragraphs[0].runs[0].bold = True
+        cell.add_paragraph('после табеле')
+        deepest = inner.cell(1, 1).add_table(rows=1, cols=2)
+        deepest.cell(0, 0).text = 'Ниво 3'
+        deepest.cell(0, 1).text = '7,5'
+        table.cell(2, 2).add_table(rows=1, cols=1).cell(0, 0).text = 'само угњеждено'
+        document.save(path)
+
+# Функција која претвара Excel датотеку у семантички снимак
+# Снимак садржи вредности, подебљање, величину фонта, формат броја,
+# поравнање, ширине колона и висине редова
+def snapshot(excel_file):
+    workbook = openpyxl.load_workbook(excel_file)
+    sheets = {}
+    for worksheet in workbook.worksheets:
+        rows = []
+        for row in worksheet.iter_rows():
+            rows.append([[cell.value, bool(cell.font.b), cell.font.sz, cell.number_format,
+                          cell.alignment.horizontal, bool(cell.alignment.wrap_text)]
+                         for cell in row])
+        sheets[worksheet.title] = {
+            'rows': rows,
+            'column_widths': {k: v.width for k, v in sorted(worksheet.column_dimensions.items())},
+            'row_heights': {str(k): v.height for k, v in sorted(worksheet.row_dimensions.items())},
+        }
+    return sheets
+
+# Функција која проналази прву разлику између два снимка
+def first_difference(expected, actual):
+    if expected.keys() != actual.keys():
+        return f"листови: очекивано {sorted(expected)}, добијено {sorted(actual)}"
+    for title in expected:
+        exp_sheet, act_sheet = expected[title], actual[title]
+        if len(exp_sheet['rows']) != len(act_sheet['rows']):
+            return (f"{title}: број редова {len(exp_sheet['rows'])} → "
+                    f"{len(act_sheet['rows'])}")
+        for row_idx, (exp_row, act_row) in enumerate(zip(exp_sheet['rows'], act_sheet['rows'])):
+            if exp_row != act_row:
+                return f"{title}: ред {row_idx + 1}: {exp_row} → {act_row}"
+        for key in ('column_widths', 'row_heights'):
+            if exp_sheet[key] != act_sheet[key]:
+                return f"{title}: {key} {exp_sheet[key]} → {act_sheet[key]}"
+    return None
+
+# Функција за упис еталона – по један ред табеле у линији ради прегледних разлика
+def dump_golden(sheets):
+    lines = ['{']
+    for sheet_idx, (title, sheet) in enumerate(sheets.items()):
+        lines.append(f" {json.dumps(title, ensure_ascii=False)}: {{")
+        lines.append('  "rows": [')
+        rows = [f"   {json.dumps(row, ensure_ascii=False)}" for row in sheet['rows']]
+        lines.append(',\n'.join(rows))
+        lines.append('  ],')
+        lines.append(f'  "column_widths": {json.dumps(sheet["column_widths"])},')
+        lines.append(f'  "row_heights": {json.dumps(sheet["row_heights"])}')
+        lines.append(' }' + (',' if sheet_idx < len(sheets) - 1 else ''))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+# Функција која конвертује документ у меморији и мери време и вршну меморију
+# Време је најбоље од више понављања, меморија се мери засебно (tracemalloc успорава)
+def measure(word_file, repeat, converter):
+    best = None
+    output = None
+    for _ in range(repeat):
+        buffer = io.BytesIO()
+        started = time.perf_counter()
+        if not converter.convert(word_file, buffer):
+            raise RuntimeError(f"конверзија није успела: {word_file.name}")
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        output = buffer
+    tracemalloc.start()
+    try:
+        converter.convert(word_file, io.BytesIO())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    output.seek(0)
+    return output, best, peak / (1024 * 1024)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Регресиони тест излаза са буџетима перформанси')
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR,
+                        help='директоријум са .docx документима корпуса')
+    parser.add_argument('--update', action='store_true', help='поновно генерисање еталона')
+    parser.add_argument('--update-budgets', action='store_true',
+                        help='упис нових буџета на основу мерења')
+    parser.add_argument('--repeat', type=int, default=3, help='број понављања за мерење времена')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='паралелно извлачење у N процеса за сваки документ, без обзира на '
+                             'величину (буџети се тада не проверавају)')
+    args = parser.parse_args(argv)
+    converter = w2e.Converter(jobs=args.jobs)
+    if args.jobs > 1:
+        w2e.PARALLEL_MIN_CELLS = 0
+
+    if args.fixtures == FIXTURES_DIR:
+        make_fixtures()
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    budgets = json.loads(BUDGETS_FILE.read_text(encoding='utf-8')) if BUDGETS_FILE.exists() else {}
+
+    failures = []
+    for word_file in sorted(args.fixtures.glob('*.docx')):
+        output, seconds, peak_mb = measure(word_file, args.repeat, converter)
+        actual = snapshot(output)
+        golden_file = GOLDEN_DIR / f"{word_file.stem}.json"
+        status = []
+
+        if args.update or not golden_file.exists():
+            golden_file.write_text(dump_golden(actual), encoding='utf-8')
+            status.append('еталон уписан')
+        else:
+            # Поновно учитавање кроз JSON ради истог облика вредности
+            actual = json.loads(json.dumps(actual))
+            expected = json.loads(golden_file.read_text(encoding='utf-8'))
+            difference = first_difference(expected, actual)
+            if difference:
+                failures.append(f"{word_file.name}: излаз се разликује – {difference}")
+                status.append('ИЗЛАЗ')
+
+        if args.update_budgets:
+            budgets[word_file.name] = {
+                'seconds': round(max(seconds * BUDGET_HEADROOM, MIN_SECONDS), 3),
+                'peak_mb': round(max(peak_mb * BUDGET_HEADROOM, MIN_PEAK_MB), 1),
+            }
+        budget = budgets.get(word_file.name) if args.jobs == 1 else None
+        if budget:
+            if seconds > budget['seconds']:
+                failures.append(f"{word_file.name}: време {seconds:.3f} с > буџет {budget['seconds']} с")
+                status.append('ВРЕМЕ')
+            if peak_mb > budget['peak_mb']:
+                failures.append(f"{word_file.name}: меморија {peak_mb:.1f} MB > буџет {budget['peak_mb']} MB")
+                status.append('МЕМОРИЈА')
+
+        print(f"{word_file.name:30} {seconds:8.3f} с {peak_mb:8.1f} MB  {', '.join(status) or 'у реду'}")
+
+    if args.update_budgets:
+        BUDGETS_FILE.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+
+    if failures:
+        print('\nНеуспешне провере:')
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print('\nСве провере су прошле.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
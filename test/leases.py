@@ -0,0 +1,162 @@
+# Тест координације више радника преко дељеног радног директоријума (--work-dir)
+# Покреће N процеса конвертора над истим улазом и радним директоријумом и проверава
+# да је свака датотека обрађена тачно једном, да се истекли закуп умрлог радника
+# преузима, да се важећи закуп другог радника поштује и да датотеке истог имена
+# из различитих директоријума имају засебне закупе
+#
+# Покретање:
+#   python test/leases.py               # 4 радника
+#   python test/leases.py --workers 8
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import w2e
+
+from golden import FIXTURES_DIR, make_fixtures, snapshot
+
+# Функција која покреће раднике истовремено и враћа записе из њихових манифеста
+def run_workers(tmp, workers, work_dir, args, ttl):
+    processes = []
+    for idx in range(workers):
+        manifest = tmp / f"manifest_{work_dir.name}_{idx}.json"
+        command = [sys.executable, str(ROOT / 'w2e.py'), *args, '--output', str(tmp / 'out'),
+                   '--work-dir', str(work_dir), '--lease-ttl', str(ttl),
+                   '--worker-id', f"радник-{idx}", '--manifest', str(manifest), '--no-progress']
+        processes.append((subprocess.Popen(command, stdout=subprocess.DEVNULL,
+                                           stderr=subprocess.PIPE), manifest))
+    manifests = []
+    for process, manifest in processes:
+        _, stderr = process.communicate()
+        if process.returncode:
+            raise RuntimeError(f"радник није успео: {stderr.decode(errors='replace')}")
+        manifests.append(json.loads(manifest.read_text(encoding='utf-8')))
+    return manifests
+
+# Функција која проналази датотеке обрађене више пута или ниједном
+def check_once(manifests, expected):
+    seen = {}
+    for idx, records in enumerate(manifests):
+        for record in records:
+            if record['status'] not in ('ok', 'cached'):
+                return f"{record['file']}: {record['status']} {record['error']}"
+            if record['file'] in seen:
+                return f"{record['file']}: обрађена у манифестима {seen[record['file']]} и {idx}"
+            seen[record['file']] = idx
+    missing = sorted(set(expected) - set(seen))
+    if missing:
+        return f"необрађене датотеке: {missing}"
+    extra = sorted(set(seen) - set(expected))
+    if extra:
+        return f"неочекиване датотеке: {extra}"
+    return None
+
+# Функција која проверава да свака датотека има свој излаз са садржајем свог улаза
+def check_outputs(input_dir, output_dir, files):
+    outputs = {}
+    for file in files:
+        relative = Path(file).relative_to(input_dir).with_suffix('.xlsx')
+        output = output_dir / relative
+        if not output.exists():
+            return f"нема излаза {relative.as_posix()}"
+        buffer = io.BytesIO()
+        w2e.word_to_excel(file, buffer)
+        buffer.seek(0)
+        if snapshot(output) != snapshot(buffer):
+            return f"{relative.as_posix()}: садржај не одговара улазу"
+        # Излази истог имена из различитих директоријума морају се разликовати
+        sheets = json.dumps(snapshot(output), sort_keys=True, default=str)
+        if outputs.get(relative.name) == sheets:
+            return f"{relative.name}: исти садржај у различитим директоријумима"
+        outputs[relative.name] = sheets
+    return None
+
+# Функција која уписује закуп другог радника, по потреби застарео
+def write_lock(path, age):
+    path.write_text(json.dumps({'worker': 'умрли', 'host': 'други', 'pid': 0,
+                                'token': 'застарео', 'claimed': time.time() - age}),
+                    encoding='utf-8')
+    os.utime(path, (time.time() - age, time.time() - age))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Тест координације више радника')
+    parser.add_argument('--workers', type=int, default=4, help='број процеса')
+    parser.add_argument('--documents', type=int, default=24, help='број докумената у улазу')
+    args = parser.parse_args(argv)
+
+    make_fixtures()
+    fixtures = sorted(FIXTURES_DIR.glob('*.docx'))
+    failures = []
+
+    def step(name, error):
+        print(f"{name:45} {error or 'у реду'}")
+        if error:
+            failures.append(f"{name}: {error}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        input_dir = tmp / 'in'
+        input_dir.mkdir()
+        names = []
+        for idx in range(args.documents):
+            name = f"doc_{idx:03d}.docx"
+            shutil.copyfile(fixtures[idx % len(fixtures)], input_dir / name)
+            names.append(name)
+
+        # Истекли закуп умрлог радника и важећи закуп радника који још ради
+        work_dir = tmp / 'work'
+        work_dir.mkdir()
+        ttl = 60
+        stale, held = names[0], names[1]
+        write_lock(work_dir / f"{stale}.lock", age=ttl * 10)
+        write_lock(work_dir / f"{held}.lock", age=0)
+
+        manifests = run_workers(tmp, args.workers, work_dir, ['--input', str(input_dir)], ttl)
+        expected = [name for name in names if name != held]
+        step(f"{args.workers} радника, {len(names)} датотека", check_once(manifests, expected))
+        print(f"  датотека по раднику: {[len(records) for records in manifests]}")
+        step('истекли закуп је преузет',
+             None if (work_dir / f"{stale}.done").exists() else 'датотека није обрађена')
+        step('важећи закуп се поштује',
+             None if (work_dir / f"{held}.lock").exists() and
+             not (work_dir / f"{held}.done").exists() else 'датотека је обрађена')
+        leftover = sorted(path.name for path in work_dir.iterdir()
+                          if path.suffix in ('.lock', '.stale', '.tmp') and path.name != f"{held}.lock")
+        step('нема заосталих закупа', f"{leftover}" if leftover else None)
+
+        # Датотеке истог имена у различитим директоријумима
+        # (различитог садржаја, тако да би преписани излаз био уочен)
+        files = []
+        for shift, folder in enumerate(('север', 'југ')):
+            (input_dir / folder).mkdir()
+            for idx, name in enumerate(names[:4]):
+                shutil.copyfile(fixtures[(idx * 2 + shift) % len(fixtures)], input_dir / folder / name)
+                files.append(str(input_dir / folder / name))
+        work_dir = tmp / 'work_same_names'
+        shutil.rmtree(tmp / 'out')
+        manifests = run_workers(tmp, args.workers, work_dir,
+                                ['--input', str(input_dir), *files], ttl)
+        expected = [Path(file).relative_to(input_dir).as_posix() for file in files]
+        step('исто име у различитим директоријумима', check_once(manifests, expected) or
+             check_outputs(input_dir, tmp / 'out', files))
+
+    if failures:
+        print('\nНеуспешне провере:')
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print('\nСве провере су прошле.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
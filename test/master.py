@@ -0,0 +1,149 @@
+# Тест главне радне свеске у режиму додавања (--append)
+# Додаје документе корпуса у главну радну свеску, приморава сажимање и прекида
+# додавање и сажимање у пола (грешком и падом процеса), а после сваког корака
+# проверава да се пакет поново отвара кроз MasterWorkbook и openpyxl са очекиваним листовима;
+# лист са износима NaN и ±inf мора имати исте вредности као излаз Converter.write
+#
+# Покретање:
+#   python test/master.py
+import io
+import subprocess
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import openpyxl
+import w2e
+
+from golden import FIXTURES_DIR, make_fixtures
+
+# Функција која проверава пакет: листови и број редова морају одговарати индексу
+def check(path, expected):
+    master = w2e.MasterWorkbook(path)
+    names = [sheet['name'] for sheet in master.index['sheets']]
+    if names != [name for name, _ in expected]:
+        return f"индекс: {names}"
+    workbook = openpyxl.load_workbook(path)
+    if workbook.sheetnames != names:
+        return f"листови: {workbook.sheetnames} → {names}"
+    for (name, rows), worksheet in zip(expected, workbook.worksheets):
+        actual = sum(1 for _ in worksheet.iter_rows())
+        if actual != rows:
+            return f"{name}: {actual} редова, очекивано {rows}"
+    return None
+
+# Функција која у посебном процесу покреће код и прекида га са os._exit (пад процеса)
+def crash(code):
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {str(ROOT)!r})
+        import w2e
+    """) + textwrap.dedent(code)
+    return subprocess.run([sys.executable, '-c', script]).returncode
+
+def main():
+    make_fixtures()
+    documents = sorted(FIXTURES_DIR.glob('*.docx'))
+    stores = {path.stem: w2e.read_rows(path) for path in documents}
+    failures = []
+
+    def step(name, error):
+        print(f"{name:40} {error or 'у реду'}")
+        if error:
+            failures.append(f"{name}: {error}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'master.xlsx'
+        expected = []
+        compacted = False
+
+        # Додавање свих докумената, два пута; мањи праг приморава аутоматско сажимање
+        ratio, w2e.MasterWorkbook.COMPACT_RATIO = w2e.MasterWorkbook.COMPACT_RATIO, 0.02
+        for _ in range(2):
+            for stem, store in stores.items():
+                master = w2e.MasterWorkbook(path)
+                orphans = master.index['orphan_bytes']
+                expected.append((master.append(stem, store), len(store)))
+                compacted |= bool(orphans) and master.index['orphan_bytes'] == 0
+        w2e.MasterWorkbook.COMPACT_RATIO = ratio
+        step('додавање', check(path, expected))
+        step('аутоматско сажимање', None if compacted else 'сажимање није обављено')
+
+        master = w2e.MasterWorkbook(path)
+        master.compact()
+        step('приморано сажимање', check(path, expected) or
+             (master.index['orphan_bytes'] and 'напуштени бајтови после сажимања'))
+
+        # Грешка при упису делова: пакет се враћа на стање пре додавања
+        master = w2e.MasterWorkbook(path)
+        def fail():
+            raise OSError('нема простора на диску')
+        master._directory_parts = fail
+        try:
+            master.append('грешка', stores['basic'])
+            step('грешка при додавању', 'грешка није пријављена')
+        except OSError:
+            step('грешка при додавању', check(path, expected))
+
+        # Пад процеса после уписа новог листа преко централног директоријума
+        code = crash(f"""
+            master = w2e.MasterWorkbook({str(path)!r})
+            master._directory_parts = lambda: os._exit(3)
+            master.append('пад', w2e.read_rows({str(FIXTURES_DIR / 'basic.docx')!r}))
+        """)
+        step('пад при додавању', check(path, expected) if code == 3 else f"излазни код {code}")
+
+        # Пад процеса између уписа сажетог пакета и замене
+        master = w2e.MasterWorkbook(path)
+        expected.append((master.append('пре сажимања', stores['basic']), len(stores['basic'])))
+        code = crash(f"""
+            replace = os.replace
+            def crash_on_master(src, dst):
+                if str(dst) == {str(path)!r}:
+                    os._exit(3)
+                replace(src, dst)
+            w2e.os.replace = crash_on_master
+            w2e.MasterWorkbook({str(path)!r}).compact()
+        """)
+        error = check(path, expected) if code == 3 else f"излазни код {code}"
+        step('пад при сажимању', error or
+             (w2e.MasterWorkbook(path).index['orphan_bytes'] and 'сажимање није довршено') or
+             (list(Path(tmp).glob('.*.tmp')) and 'привремена датотека је остала'))
+
+        # Главна радна свеска остаје употребљива после опоравка
+        master = w2e.MasterWorkbook(path)
+        expected.append((master.append('после опоравка', stores['basic']), len(stores['basic'])))
+        step('додавање после опоравка', check(path, expected))
+
+        # Износи NaN и ±inf се уписују као у Converter.write (празна ћелија и текст)
+        store = w2e.RowStore()
+        for text, amount in (('nan', float('nan')), ('Infinity', float('inf')),
+                             ('-Infinity', float('-inf')), ('1.000,50', 1000.5)):
+            store.append(['1', text, amount, '160-100013-00'], [False] * 4, w2e.ROW_TABLE, 0)
+        master = w2e.MasterWorkbook(path)
+        name = master.append('nan и inf', store)
+        expected.append((name, len(store)))
+        buffer = io.BytesIO()
+        w2e.Converter().write(store, buffer)
+        converted = openpyxl.load_workbook(buffer).active
+        error = check(path, expected)
+        if not error:
+            actual = [list(row) for row in openpyxl.load_workbook(path)[name].iter_rows(values_only=True)]
+            wanted = [list(row) for row in converted.iter_rows(values_only=True)]
+            error = actual != wanted and f"{actual} → {wanted}"
+        step('NaN и бесконачност', error)
+
+    if failures:
+        print('\nНеуспешне провере:')
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print('\nСве провере су прошле.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,62 @@
 # Увоз потребних библиотека за рад са Word и Excel датотекама
 # python-docx за читање Word докумената
-# pandas за манипулацију подацима и креирање Excel датотека
-# openpyxl за напредно форматирање Excel ћелија
+# pandas за збирни преглед
+# openpyxl за креирање и форматирање Excel датотека
+import argparse
+from array import array
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from copy import copy
+import csv
+import datetime
+import difflib
+import hashlib
+from itertools import islice
+import io
+import json
+import multiprocessing
+import os
+import posixpath
+import queue
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+import zipfile
+from urllib.parse import unquote
+from xml.sax.saxutils import escape
+
 try:
     import docx
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+    import numpy as np
     import pandas as pd
     from pathlib import Path
+    from openpyxl import Workbook
+    from openpyxl.cell import Cell
     from openpyxl.styles import Alignment, PatternFill, Font
+    from openpyxl.utils import get_column_letter
+    from openpyxl.writer.excel import ExcelWriter
+    from lxml import etree
 except ImportError:
     print("Потребни пакети нису инсталирани. Молимо покрените:")
     print("pip install -r requirements.txt")
     exit(1)
 
+# psutil је опциони – користи се за мерење RSS меморије ако је инсталиран
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
 # Функција која израчунава оптималну ширину колоне на основу садржаја
 # Обрада различитих типова података за израчунавање ширине колоне
 def get_column_width(col_series):
@@ -52,25 +97,42 @@ def try_convert_number(text):
     except (ValueError, TypeError):
         return text
 
-# Функција за форматирање нумеричких вредности у Excel ћелијама
-# Примена форматирања бројева на ћелију
-def format_number(cell, value):
-    """Примена форматирања бројева на ћелију"""
-    if isinstance(value, (int, float)):
-        # Коришћење стандардног формата са зарезом као сепаратором хиљада и тачком за децимале
-        cell.number_format = '#,##0.00'  # Приказаће: 200,000.00
-        cell.alignment = Alignment(
-            vertical='top',
-            horizontal='center',  # Центрирано поравнање
-            wrap_text=False,
-            shrink_to_fit=False
-        )
-        return True
-    return False
+# Функција која извлачи текст и подебљање једног параграфа (текст није скраћен)
+def get_paragraph_text_with_format(paragraph, style_map=None):
+    para_text = ''
+    para_bold = False
+    
+    # Прво провера директног стила параграфа
+    try:
+        if style_map is not None:
+            # Подебљање стила из кеша, без поновног тражења стила у styles.xml
+            if isinstance(paragraph, Paragraph) and style_map.is_bold(paragraph._p.style):
+                para_bold = True
+        elif paragraph.style and paragraph.style.font and paragraph.style.font.bold:
+            para_bold = True
+    except AttributeError:
+        pass
+    
+    # Провера појединачних секција
+    try:
+        if hasattr(paragraph, 'runs') and paragraph.runs:
+            for run in paragraph.runs:
+                run_text = run.text.strip()
+                if run_text:
+                    # Провера директног подебљања и својстава фонта
+                    if getattr(run, 'bold', False) or (hasattr(run, 'font') and getattr(run.font, 'bold', False)):
+                        para_bold = True
+                    para_text += run.text
+        else:
+            para_text = paragraph.text
+    except AttributeError:
+        para_text = paragraph.text if hasattr(paragraph, 'text') else ''
+    
+    return para_text, para_bold
 
 # Функција која извлачи текст и информације о форматирању из Word елемената
 # Обрада параграфа и ћелија табеле за подебљани текст
-def get_text_with_format(text_element):
+def get_text_with_format(text_element, style_map=None):
     """Обрада параграфа и ћелија табеле за подебљани текст"""
     text = ''
     is_bold = False
@@ -79,37 +141,92 @@ def get_text_with_format(text_element):
     paragraphs = text_element.paragraphs if hasattr(text_element, 'paragraphs') else [text_element]
     
     for paragraph in paragraphs:
-        para_text = ''
-        para_bold = False
-        
-        # Прво провера директног стила параграфа
-        try:
-            if paragraph.style and paragraph.style.font and paragraph.style.font.bold:
-                para_bold = True
-        except AttributeError:
-            pass
-        
-        # Провера појединачних секција
-        try:
-            if hasattr(paragraph, 'runs') and paragraph.runs:
-                for run in paragraph.runs:
-                    run_text = run.text.strip()
-                    if run_text:
-                        # Провера директног подебљања и својстава фонта
-                        if getattr(run, 'bold', False) or (hasattr(run, 'font') and getattr(run.font, 'bold', False)):
-                            para_bold = True
-                        para_text += run.text
-            else:
-                para_text = paragraph.text
-        except AttributeError:
-            para_text = paragraph.text if hasattr(paragraph, 'text') else ''
-        
+        para_text, para_bold = get_paragraph_text_with_format(paragraph, style_map)
         text += para_text
         if para_bold:
             is_bold = True
     
     return text.strip(), is_bold
 
+# Начини обраде табела угњеждених у ћелије: текст се уграђује у ћелију родитеља
+# (inline) или се редови угњеждене табеле додају испод реда родитеља (rows)
+NESTED_INLINE, NESTED_ROWS = NESTED_POLICIES = ('inline', 'rows')
+
+W_P, W_TBL, W_TR, W_TC, W_T = qn('w:p'), qn('w:tbl'), qn('w:tr'), qn('w:tc'), qn('w:t')
+
+# Функција која итеративно обилази XML ћелије у редоследу документа
+# Уместо рекурзије користи експлицитни стек итератора, па је цена линеарна у броју
+# елемената без ограничења дубине. Враћа догађаје (врста, дубина, елемент):
+# 'p' за пасус, 'row' и 'end' на почетку и крају реда угњеждене табеле, 'cell' за ћелију
+def walk_cell(tc):
+    stack = [(tc.iterchildren(W_P, W_TBL), 0, None)]
+    while stack:
+        children, depth, end = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if end is not None:
+                yield end
+            continue
+        tag = child.tag
+        if tag == W_P:
+            yield 'p', depth, child
+        elif tag == W_TBL:
+            stack.append((child.iterchildren(W_TR), depth + 1, None))
+        elif tag == W_TR:
+            yield 'row', depth, child
+            stack.append((child.iterchildren(W_TC), depth, ('end', depth, child)))
+        else:
+            yield 'cell', depth, child
+            stack.append((child.iterchildren(W_P, W_TBL), depth, None))
+
+# Функција која извлачи текст ћелије табеле заједно са угњежденим табелама
+# Враћа (текст, подебљање, угњеждени редови); угњеждени редови су (текстови,
+# подебљања) и постоје само у начину NESTED_ROWS
+def get_cell_content(cell, style_map=None, nested=NESTED_INLINE):
+    tc = cell._tc
+    if not tc.tbl_lst:
+        text, is_bold = get_text_with_format(cell, style_map)
+        return text, is_bold, ()
+    
+    inline = nested == NESTED_INLINE
+    # Текући садржај [делови текста, подебљање] ћелије на свакој дубини
+    cells = [[[], False]]
+    open_rows = []
+    nested_rows = []
+    for event, depth, element in walk_cell(tc):
+        if event == 'p':
+            text, is_bold = get_paragraph_text_with_format(Paragraph(element, cell), style_map)
+            cells[depth][0].append(text)
+            if is_bold:
+                # Уграђени текст подебљава ћелију родитеља као и њени пасуси
+                cells[0 if inline else depth][1] = True
+        elif event == 'row':
+            row = []
+            open_rows.append(row)
+            if not inline:
+                nested_rows.append(row)
+        elif event == 'cell':
+            content = [[], False]
+            del cells[depth:]
+            cells.append(content)
+            open_rows[-1].append(content)
+        else:
+            row = open_rows.pop()
+            if inline:
+                # Ћелије реда се спајају размаком, а сваки ред је у засебној линији
+                line = ' '.join(text for text in (''.join(parts).strip() for parts, _ in row) if text)
+                parts = cells[depth - 1][0]
+                if line:
+                    if parts and not parts[-1].endswith('\n'):
+                        parts.append('\n')
+                    parts.append(line + '\n')
+    
+    text = ''.join(cells[0][0]).strip()
+    rows = [([''.join(parts).strip() for parts, _ in row], [is_bold for _, is_bold in row])
+            for row in nested_rows]
+    return text, cells[0][1], rows
+
 # Функција која форматира текст тако да број буде у новом реду после имена
 # Форматирање текста тако да број буде у новом реду после имена
 def format_name_number(text):
@@ -132,136 +249,2357 @@ def format_name_number(text):
             
     return text
 
-# Главна функција за конверзију Word документа у Excel
-# Обрађује текст и табеле, задржава форматирање и структуру документа
-def word_to_excel(word_file, excel_file):
-    # Учитавање Word документа у меморију
-    doc = docx.Document(word_file)
+# Класа без ефекта која се користи када профилисање меморије није укључено
+class NullProfiler:
+    def mark(self, stage):
+        pass
+    
+    def finish(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+# Функција која враћа тренутну RSS меморију процеса у бајтовима (или None)
+def current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# tracemalloc.reset_peak постоји тек од Python 3.9
+_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+# Класа за профилисање меморије по фазама конверзије
+# Користи tracemalloc за вршне и задржане алокације и узоркује RSS у позадини;
+# фазе су: учитавање (load), извлачење (extract), радна свеска (workbook) и чување (save)
+class MemoryProfiler:
+    """Извештај о вршној и задржаној меморији по фазама и датотекама"""
+    
+    # Интервал узорковања RSS меморије (у секундама)
+    RSS_INTERVAL = 0.005
+    
+    def __init__(self, top_sites=10):
+        self.top_sites = top_sites
+        self.reports = []
+        self._file = None
+        self._stage = None
+        self._rss_peak = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # Сопствене алокације tracemalloc-а и профилера се не бележе
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                         tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+        if current_rss() is not None:
+            self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler.start()
+    
+    def _sample_rss(self):
+        while not self._stop.wait(self.RSS_INTERVAL):
+            rss = current_rss()
+            with self._lock:
+                if rss > self._rss_peak:
+                    self._rss_peak = rss
+    
+    def begin_file(self, name):
+        """Почетак профилисања једне датотеке"""
+        self._file = {'file': name, 'stages': [], 'top_sites': []}
+        # Фаза претходне датотеке која није завршена не прелази у нови извештај
+        self._stage = None
+        self._baseline = tracemalloc.take_snapshot().filter_traces(self._filters)
+        self._largest = 0
+    
+    def mark(self, stage):
+        """Завршетак претходне фазе и почетак нове"""
+        now = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stage is not None:
+            name, started, start_current, start_peak = self._stage
+            if not _RESET_PEAK and peak <= start_peak:
+                # Без reset_peak је вршна вредност фазе позната само ако је фаза достигла
+                # нов врх; иначе је доња граница већа од почетне и крајње заузетости
+                peak = max(start_current, current)
+            with self._lock:
+                rss_peak = max(self._rss_peak, current_rss() or 0)
+            self._file['stages'].append({
+                'stage': name,
+                'seconds': round(now - started, 4),
+                'peak_mb': round(peak / 2**20, 3),
+                'retained_mb': round((current - start_current) / 2**20, 3),
+                'rss_peak_mb': round(rss_peak / 2**20, 3) if rss_peak else None,
+            })
+            # Места алокација се бележе у тренутку највеће задржане меморије
+            if current > self._largest:
+                self._largest = current
+                self._record_sites()
+        if stage is None:
+            self._stage = None
+            return
+        if _RESET_PEAK:
+            tracemalloc.reset_peak()
+        with self._lock:
+            self._rss_peak = current_rss() or 0
+        self._stage = (stage, time.perf_counter(), *tracemalloc.get_traced_memory())
+    
+    def _record_sites(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._filters)
+        stats = snapshot.compare_to(self._baseline, 'lineno')
+        self._file['top_sites'] = [
+            {'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             'size_mb': round(stat.size_diff / 2**20, 3), 'count': stat.count_diff}
+            for stat in stats[:self.top_sites]
+        ]
+    
+    def finish(self):
+        """Завршетак последње фазе текуће датотеке"""
+        if self._stage is not None:
+            self.mark(None)
+    
+    def end_file(self):
+        """Чување извештаја текуће датотеке"""
+        self.finish()
+        if self._file is not None:
+            self.reports.append(self._file)
+            self._file = None
+    
+    def close(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        tracemalloc.stop()
+    
+    def summary(self):
+        """Највеће вредности по фазама за све датотеке (за димензионисање контејнера)"""
+        totals = {}
+        for report in self.reports:
+            for stage in report['stages']:
+                entry = totals.setdefault(stage['stage'], {'peak_mb': 0.0, 'retained_mb': 0.0,
+                                                           'rss_peak_mb': 0.0})
+                for key in entry:
+                    entry[key] = max(entry[key], stage[key] or 0.0)
+        lines = [f"{'Фаза':12} {'врх MB':>10} {'задржано MB':>12} {'RSS MB':>10}"]
+        for name, entry in totals.items():
+            lines.append(f"{name:12} {entry['peak_mb']:10.1f} {entry['retained_mb']:12.1f} "
+                         f"{entry['rss_peak_mb']:10.1f}")
+        return '\n'.join(lines)
+    
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.reports, f, ensure_ascii=False, indent=2)
+
+# Класа са подебљањем стилова пасуса једног шаблона (ID стила → подебљан)
+class StyleMap:
+    __slots__ = ('bold', 'default')
+    
+    def __init__(self, bold, default):
+        self.bold = bold
+        self.default = default
+    
+    def is_bold(self, style_id):
+        """Подебљање стила пасуса; непознат или изостављен стил значи подразумевани"""
+        if style_id is None:
+            return self.default
+        return self.bold.get(style_id, self.default)
+
+# Класа за кеш обрађених стилова по шаблону
+# Кључ је хеш дела styles.xml, па документи из истог шаблона прескачу обраду стилова;
+# кеш се може чувати у JSON датотеци између покретања
+class StyleCache:
+    """Кеш мапа стилова по хешу styles.xml"""
+    
+    # Сви кешеви процеса (слабе референце), ради обнове брава после fork()
+    instances = weakref.WeakSet()
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.maps = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self.maps = self._load()
+        StyleCache.instances.add(self)
+    
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def resolve(doc):
+        """Обрада стилова документа: исти резултат као paragraph.style.font.bold"""
+        bold = {}
+        for style in doc.styles:
+            if style.type == WD_STYLE_TYPE.PARAGRAPH:
+                bold[style.style_id] = bool(style.font.bold)
+        default = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        return {'bold': bold, 'default': bool(default is not None and default.font.bold)}
+    
+    def for_document(self, doc, stats=None):
+        """Мапа стилова за документ, из кеша ако је шаблон већ виђен"""
+        key = hashlib.sha256(etree.tostring(doc.styles.element)).hexdigest()
+        with self._lock:
+            entry = self.maps.get(key)
+            hit = entry is not None
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            entry = self.resolve(doc)
+            with self._lock:
+                self.maps[key] = entry
+        if stats is not None:
+            stats['style_cache_hit'] = hit
+        return StyleMap(entry['bold'], entry['default'])
+    
+    def save(self):
+        """Упис кеша (спојеног са оним што су други процеси у међувремену уписали)"""
+        if not self.path:
+            return
+        with self._lock:
+            maps = {**self._load(), **self.maps} if self.path.exists() else dict(self.maps)
+        tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(maps, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+    
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f"Кеш стилова: {self.hits} погодака, {self.misses} промашаја ({rate:.1f}%)"
+
+# Подразумевани кеш стилова у меморији процеса
+STYLE_CACHE = StyleCache()
+
+# Брава кеша стилова може бити заузета у тренутку fork() у другој нити, па процес
+# дете добија нове браве (садржај кеша се наслеђује)
+def _reset_style_cache_locks():
+    for style_cache in StyleCache.instances:
+        style_cache._lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_style_cache_locks)
+
+# Врсте редова у складишту редова
+ROW_PARAGRAPH, ROW_TABLE, ROW_SPACER = range(3)
+
+# Класа за компактно складиштење извучених редова
+# Уместо паралелних листа листа (редови, подебљање, ознака табеле) вредности се
+# чувају у једној равној листи са помацима редова, подебљање као низ битова по ћелији,
+# а врста реда и индекс табеле као низови бајтова/целих бројева
+class RowStore:
+    """Извучени редови документа у колонском облику"""
+    
+    __slots__ = ('values', 'offsets', 'kinds', 'tables', 'bold_bits')
+    
+    def __init__(self):
+        self.values = []
+        self.offsets = array('I', [0])
+        self.kinds = bytearray()
+        self.tables = array('i')
+        self.bold_bits = bytearray()
+    
+    def append(self, row_data, row_format, kind, table=-1):
+        """Додавање једног реда"""
+        start = len(self.values)
+        self.values.extend(row_data)
+        end = len(self.values)
+        missing = ((end + 7) >> 3) - len(self.bold_bits)
+        if missing > 0:
+            self.bold_bits.extend(bytes(missing))
+        for col_idx, bold in enumerate(row_format):
+            if bold:
+                idx = start + col_idx
+                self.bold_bits[idx >> 3] |= 1 << (idx & 7)
+        self.offsets.append(end)
+        self.kinds.append(kind)
+        self.tables.append(table)
+    
+    def __len__(self):
+        return len(self.kinds)
+    
+    def row(self, row_idx):
+        """Вредности реда као листа"""
+        return self.values[self.offsets[row_idx]:self.offsets[row_idx + 1]]
+    
+    def row_length(self, row_idx):
+        return self.offsets[row_idx + 1] - self.offsets[row_idx]
+    
+    def is_bold(self, row_idx, col_idx):
+        """Подебљање ћелије; ћелије изван реда нису подебљане"""
+        if col_idx >= self.row_length(row_idx):
+            return False
+        idx = self.offsets[row_idx] + col_idx
+        return bool(self.bold_bits[idx >> 3] & (1 << (idx & 7)))
+    
+    def bolds(self, row_idx):
+        return [self.is_bold(row_idx, col_idx) for col_idx in range(self.row_length(row_idx))]
+    
+    def __iter__(self):
+        for row_idx in range(len(self)):
+            yield self.row(row_idx)
+    
+    def width(self):
+        """Број колона најширег реда"""
+        return max((self.row_length(row_idx) for row_idx in range(len(self))), default=0)
+
+# Функција која секвенцијално извлачи редове из Word документа
+# Враћа генератор (вредности реда, ознаке подебљања, врста реда, индекс табеле)
+# у редоследу документа; индекс табеле је -1 за пасусе ван табела
+def extract_rows(doc, stats=None, style_cache=None, nested=NESTED_INLINE, row_filter=None):
+    style_map = (style_cache or STYLE_CACHE).for_document(doc, stats)
+    yield from extract_range(doc, style_map, stats, nested=nested, row_filter=row_filter)
+
+# Класа са филтером извлачења: само табеле, одабране табеле (индекси од 0) или само
+# редови табела чија трећа колона је износ. Филтер се примењује на нивоу XML-а пре
+# извлачења текста и форматирања, па прескочени садржај скоро ништа не кошта
+class RowFilter:
+    """Филтер пасуса, табела и редова при извлачењу"""
+    
+    __slots__ = ('tables_only', 'tables', 'amounts')
+    
+    def __init__(self, tables_only=False, tables=None, amounts=False):
+        self.tables_only = tables_only
+        self.tables = frozenset(tables) if tables is not None else None
+        self.amounts = amounts
     
-    # Иницијализација листи за чување података и информација о форматирању
-    rows = []
-    is_bold_format = []  # Праћење подебљаног текста
+    @property
+    def paragraphs(self):
+        """Да ли се пасуси ван табела задржавају"""
+        return not (self.tables_only or self.tables is not None or self.amounts)
     
-    row_count = 0  # Бројач редова у табели
+    def table(self, table_idx):
+        return self.tables is None or table_idx in self.tables
+    
+    @staticmethod
+    def amount_candidate(tr, nested=NESTED_INLINE):
+        """Брза провера реда на нивоу XML-а: може ли трећа колона бити износ
+        
+        Ред без цифре у тексту ћелије треће колоне сигурно нема износ; остали
+        редови се извлаче и проверавају тачно (is_amount_row).
+        """
+        col_idx = 0
+        for tc in tr.tc_lst:
+            # Редови угњеждених табела у начину NESTED_ROWS могу имати своје износе
+            if nested == NESTED_ROWS and tc.tbl_lst:
+                return True
+            col_idx += tc.grid_span
+            if col_idx > 2:
+                if tc.vMerge == 'continue':
+                    # Садржај је у ћелији изнад, па одлучује тачна провера
+                    return True
+                return any(ch.isdigit() for text in tc.itertext(W_T) for ch in text)
+        return False
+    
+    @staticmethod
+    def is_amount_row(row_data):
+        value = row_data[2] if len(row_data) > 2 else None
+        return isinstance(value, float) and bool(np.isfinite(value))
+    
+    def settings(self):
+        """Подешавања филтера за кључ кеша"""
+        return {'tables_only': self.tables_only,
+                'tables': sorted(self.tables) if self.tables is not None else None,
+                'amounts': self.amounts}
+
+# Функција која обрађује списак табела са командне линије (нпр. 1,3-5; броје се од 1)
+# и враћа индексе табела од 0
+def parse_table_list(text):
+    indexes = set()
+    try:
+        for part in text.split(','):
+            first, _, last = part.strip().partition('-')
+            first = int(first)
+            last = int(last) if last else first
+            if first < 1 or last < first:
+                raise ValueError(part)
+            indexes.update(range(first - 1, last))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"неисправан списак табела: {text}")
+    return frozenset(indexes)
+
+# Функција која претвара текст ћелије табеле према колони
+# (име и број у посебним линијама у другој колони, износ у трећој)
+def table_cell_value(col_idx, text):
+    if col_idx == 1:
+        return format_name_number(text)
+    if col_idx == 2:
+        return try_convert_number(text.strip())
+    return text
+
+# Функција која извлачи редове из узастопног опсега елемената тела документа
+# Опсег почиње елементом start (до stop), table_start је број претходних табела,
+# а first_row означава да испред опсега нема ниједног реда табеле
+def extract_range(doc, style_map, stats=None, start=0, stop=None, table_start=0, first_row=True,
+                  nested=NESTED_INLINE, row_filter=None):
+    row_count = 0 if first_row else 1  # Бројач редова у табели
+    table_count = table_start  # Бројач табела у документу
+    # Табеле тела документа, у истом редоследу у ком се појављују у телу
+    tables = doc.tables
+    keep_paragraphs = row_filter is None or row_filter.paragraphs
+    amounts = row_filter is not None and row_filter.amounts
     
     # Секвенцијална обрада документа
-    for element in doc.element.body:
+    for element in islice(doc.element.body, start, stop):
         if element.tag.endswith('tbl'):
-            table = doc.tables[len([e for e in doc.element.body[:doc.element.body.index(element)] 
-                                  if e.tag.endswith('tbl')])]
+            table_count += 1
+            if stats is not None:
+                stats['tables'] = table_count
+            if row_filter is not None and not row_filter.table(table_count - 1):
+                # Прескочена табела се само броји (због првог реда документа)
+                row_count += len(element.tr_lst)
+                continue
+            table = tables[table_count - 1]
             
-            rows.append([''])
-            is_bold_format.append([False])
+            yield [''], [False], ROW_SPACER, table_count - 1
+            # Угњеждене табеле чији су редови већ издвојени (у начину NESTED_ROWS);
+            # спојене ћелије се понављају у row.cells у истом и у наредним редовима
+            # (вертикално спајање), па се свака угњеждена табела издваја једном по табели
+            seen = set()
             
             for row in table.rows:
                 row_data = []
                 row_format = []
                 row_count += 1
+                if amounts and not RowFilter.amount_candidate(row._tr, nested):
+                    continue
+                # Редови угњеждених табела (у начину NESTED_ROWS) иду испод реда родитеља
+                nested_rows = []
                 
                 for col_idx, cell in enumerate(row.cells):
-                    text, is_bold = get_text_with_format(cell)
+                    text, is_bold, cell_rows = get_cell_content(cell, style_map, nested)
+                    if cell_rows and cell._tc.tbl_lst[0] not in seen:
+                        seen.update(cell._tc.tbl_lst)
+                        nested_rows.extend(cell_rows)
                     # Промена текста четврте колоне ако је први ред
                     if col_idx == 3 and row_count == 1:
                         text = "Текући рачун"
-                    elif col_idx == 1:
-                        text = format_name_number(text)
-                    elif col_idx == 2:
-                        text = try_convert_number(text.strip())
+                    else:
+                        text = table_cell_value(col_idx, text)
                     row_data.append(text)
                     row_format.append(is_bold)
                 
-                if any(str(x) for x in row_data):
-                    rows.append(row_data)
-                    is_bold_format.append(row_format)
+                if any(str(x) for x in row_data) and (not amounts or RowFilter.is_amount_row(row_data)):
+                    yield row_data, row_format, ROW_TABLE, table_count - 1
+                for texts, bolds in nested_rows:
+                    nested_data = [table_cell_value(col_idx, text) for col_idx, text in enumerate(texts)]
+                    if any(str(x) for x in nested_data) and (not amounts or
+                                                              RowFilter.is_amount_row(nested_data)):
+                        yield nested_data, bolds, ROW_TABLE, table_count - 1
             
             # Додавање празног реда после табеле
-            rows.append([''])
-            is_bold_format.append([False])
+            yield [''], [False], ROW_SPACER, table_count - 1
                 
-        elif element.tag.endswith('p'):  # Параграф
-            text, is_bold = get_text_with_format(element)
+        elif element.tag.endswith('p') and keep_paragraphs:  # Параграф
+            text, is_bold = get_text_with_format(element, style_map)
             if text:
-                rows.append([text])
-                is_bold_format.append([is_bold])
+                yield [text], [is_bold], ROW_PARAGRAPH, -1
+
+# Типови релација делова пакета које конвертор стварно чита
+# (главни документ, стилови и нумерација); слике, заглавља, теме и остало се прескачу
+FAST_LOAD_RELTYPES = ('/officeDocument', '/styles', '/numbering')
+
+# Функција која враћа путању .rels дела за задати део пакета
+def _rels_partname(partname):
+    folder, name = posixpath.split(partname)
+    return posixpath.join(folder, '_rels', f"{name}.rels")
+
+# Функција која прави умањени пакет у меморији само са деловима које конвертор чита
+# Из изворног ZIP-а се декомпресују само ти делови; word/media/* се никад не чита
+def slim_package(word_file):
+    """Враћа BytesIO са .docx пакетом без слика и неповезаних делова"""
+    slim = io.BytesIO()
+    with zipfile.ZipFile(word_file) as src, zipfile.ZipFile(slim, 'w', zipfile.ZIP_STORED) as dst:
+        names = set(src.namelist())
+        dst.writestr('[Content_Types].xml', src.read('[Content_Types].xml'))
+        pending = ['']  # делови чије се релације обрађују ('' је сам пакет)
+        visited = set()
+        while pending:
+            partname = pending.pop()
+            rels_name = _rels_partname(partname) if partname else '_rels/.rels'
+            if rels_name not in names:
+                continue
+            rels = etree.fromstring(src.read(rels_name))
+            base = posixpath.dirname(partname)
+            for rel in list(rels):
+                if rel.get('TargetMode') == 'External':
+                    continue
+                if not rel.get('Type', '').endswith(FAST_LOAD_RELTYPES):
+                    rels.remove(rel)
+                    continue
+                target = posixpath.normpath(posixpath.join(base, unquote(rel.get('Target'))))
+                target = target.lstrip('/')
+                if target not in names:
+                    rels.remove(rel)
+                    continue
+                if target not in visited:
+                    visited.add(target)
+                    dst.writestr(target, src.read(target))
+                    pending.append(target)
+            dst.writestr(rels_name, etree.tostring(rels, xml_declaration=True,
+                                                   encoding='UTF-8', standalone=True))
+    slim.seek(0)
+    return slim
+
+# Функција за учитавање Word документа
+# У брзом режиму се учитавају само тело, стилови и нумерација, без слика и осталих делова
+def load_document(word_file, fast_load=False):
+    if fast_load:
+        return docx.Document(slim_package(word_file))
+    return docx.Document(word_file)
+
+# Функција која учитава документ и враћа складиште свих извучених редова
+def read_rows(word_file, stats=None, fast_load=False, profiler=None, style_cache=None, jobs=1,
+              nested=NESTED_INLINE, row_filter=None):
+    profiler = profiler or NULL_PROFILER
+    
+    # Учитавање Word документа у меморију
+    profiler.mark('load')
+    if jobs > 1:
+        # Процеси за паралелно извлачење поново учитавају документ из истих бајтова
+        data = document_bytes(word_file)
+        word_file = io.BytesIO(data)
+    doc = load_document(word_file, fast_load)
+    
+    profiler.mark('extract')
+    # Складиште за вредности и информације о форматирању
+    store = RowStore()
+    counters = {'tables': 0}
+    amounts = AmountAccumulator()
+    if jobs > 1:
+        rows = extract_rows_parallel(doc, data, jobs, fast_load, counters, style_cache, nested,
+                                     row_filter)
+    else:
+        rows = extract_rows(doc, counters, style_cache, nested, row_filter)
+    for row_data, row_format, kind, table in rows:
+        store.append(row_data, row_format, kind, table)
+        amounts.add_row(row_data)
+    if stats is not None:
+        stats['style_cache_hit'] = counters['style_cache_hit']
+        stats['tables'] = counters['tables']
+        stats['rows'] = len(store)
+        stats.update(amounts.result())
+    return store
+
+# Функција која враћа садржај документа (путања или фајл објекат) као бајтове
+def document_bytes(word_file):
+    if hasattr(word_file, 'read'):
+        word_file.seek(0)
+        return word_file.read()
+    return Path(word_file).read_bytes()
+
+# Најмањи обим тела документа (ћелије табела и пасуси) за паралелно извлачење;
+# мањи документи се извлаче секвенцијално јер би покретање процеса трајало дуже
+PARALLEL_MIN_CELLS = 20000
+# Број опсега по процесу – ситнији опсези равномерније расподељују рад
+PARALLEL_CHUNKS_PER_JOB = 4
+
+# Функција која дели тело документа на узастопне опсеге приближно једнаког обима
+# Обим табеле је број њених ћелија, а пасуса 1; враћа опсеге у облику аргумената
+# extract_range (почетак, крај, број претходних табела, први ред) и укупан обим
+def split_body(doc, parts):
+    weights = []
+    for element in doc.element.body:
+        if element.tag.endswith('tbl'):
+            weights.append((True, len(element.tr_lst), int(element.xpath('count(./w:tr/w:tc)'))))
+        else:
+            weights.append((False, 0, 1))
+    total = sum(weight for _, _, weight in weights)
+    target = total / max(parts, 1)
+    
+    chunks = []
+    start = table_start = tables = rows = filled = 0
+    first_row = True
+    for idx, (is_table, table_rows, weight) in enumerate(weights):
+        filled += weight
+        if is_table:
+            tables += 1
+            rows += table_rows
+        if filled >= target or idx == len(weights) - 1:
+            chunks.append((start, idx + 1, table_start, first_row))
+            start, table_start, first_row = idx + 1, tables, rows == 0
+            filled = 0
+    return chunks, total
+
+# Функција која враћа контекст за покретање процеса паралелног извлачења
+# forkserver (где постоји) не копира нити и браве процеса који покреће извлачење,
+# а модул са библиотекама се у серверу учитава једном, па су нови процеси брзи
+def parallel_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+# Стање процеса за паралелно извлачење: документ и мапа стилова учитани једном
+_RANGE_WORKER = {}
+
+def _init_range_worker(data, fast_load, bold, default):
+    _RANGE_WORKER['doc'] = load_document(io.BytesIO(data), fast_load)
+    _RANGE_WORKER['style_map'] = StyleMap(bold, default)
+
+def _extract_range_chunk(chunk):
+    return list(extract_range(_RANGE_WORKER['doc'], _RANGE_WORKER['style_map'], None, *chunk))
+
+# Функција која извлачи редове великог документа у више процеса
+# Тело се дели на узастопне опсеге табела и пасуса, сваки процес учитава документ
+# једном, а резултати опсега се спајају у редоследу документа, па је излаз исти
+# као код секвенцијалног извлачења. Мали документи се извлаче секвенцијално.
+def extract_rows_parallel(doc, data, jobs, fast_load=False, stats=None, style_cache=None,
+                          nested=NESTED_INLINE, row_filter=None):
+    style_map = (style_cache or STYLE_CACHE).for_document(doc, stats)
+    chunks, total = split_body(doc, jobs * PARALLEL_CHUNKS_PER_JOB)
+    if total < PARALLEL_MIN_CELLS or len(chunks) < 2:
+        yield from extract_range(doc, style_map, stats, nested=nested, row_filter=row_filter)
+        return
+    tables = sum(1 for element in doc.element.body if element.tag.endswith('tbl'))
+    if stats is not None and tables:
+        stats['tables'] = tables
+    context = parallel_context()
+    with ProcessPoolExecutor(min(jobs, len(chunks)), mp_context=context,
+                             initializer=_init_range_worker,
+                             initargs=(data, fast_load, style_map.bold, style_map.default)) as pool:
+        for rows in pool.map(_extract_range_chunk, [chunk + (nested, row_filter) for chunk in chunks]):
+            yield from rows
+
+# Класа за сабирање износа из треће колоне табела током извлачења
+# Вредности које је try_convert_number већ претворио у број се уписују у NumPy
+# бафер, а пун бафер се сабира у делимичан збир (без чувања свих вредности)
+class AmountAccumulator:
+    """Збир износа, број редова и број непрепознатих износа једног документа"""
     
-    # Креирање DataFrame-а без заглавља
-    final_df = pd.DataFrame(rows)
+    CHUNK = 4096
     
-    # Додавање колоне маркера за идентификацију редова табеле
-    is_table = []
-    for row in rows:
-        is_table.append(len(row) > 1)  # Ако ред има више колона, то је ред табеле
+    def __init__(self):
+        self._buffer = np.empty(self.CHUNK, dtype=np.float64)
+        self._filled = 0
+        self._partials = []
+        self.table_rows = 0
+        self.amount_rows = 0
+        self.unparsed = 0
     
-    # Чување у Excel са форматирањем
-    try:
-        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-            # Упис DataFrame-а без заглавља
-            final_df.to_excel(writer, 
-                            sheet_name='Document Content',
-                            index=False,
-                            header=False)
-            worksheet = writer.sheets['Document Content']
+    def add_row(self, row_data):
+        """Обрада једног реда из extract_rows"""
+        if len(row_data) < 2:
+            return
+        self.table_rows += 1
+        if len(row_data) < 3:
+            return
+        value = row_data[2]
+        if isinstance(value, float) and np.isfinite(value):
+            self._buffer[self._filled] = value
+            self._filled += 1
+            self.amount_rows += 1
+            if self._filled == self.CHUNK:
+                self._partials.append(self._buffer.sum())
+                self._filled = 0
+        elif str(value).strip():
+            self.unparsed += 1
+    
+    def total(self):
+        return float(np.sum(self._partials) + self._buffer[:self._filled].sum())
+    
+    def result(self):
+        return {'table_rows': self.table_rows, 'amount_rows': self.amount_rows,
+                'unparsed_amounts': self.unparsed, 'amount_total': round(self.total(), 2)}
+
+# Нивои компресије .xlsx пакета: 0 је паковање без компресије (брзо чување),
+# 1–9 су нивои deflate компресије, а None је подразумевани ниво openpyxl-а (zlib 6)
+COMPRESS_LEVELS = range(10)
+
+# Функција која чува радну свеску као openpyxl save_workbook, али са задатим нивоом
+# компресије делова пакета (openpyxl увек користи deflate са подразумеваним нивоом)
+def save_workbook(workbook, excel_file, compresslevel=None):
+    compression = zipfile.ZIP_STORED if compresslevel == 0 else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(excel_file, 'w', compression, allowZip64=True,
+                         compresslevel=compresslevel or None) as archive:
+        workbook.properties.modified = datetime.datetime.now(
+            tz=datetime.timezone.utc).replace(tzinfo=None)
+        ExcelWriter(workbook, archive).write_data()
+
+# Функција која прилагођава вредност ћелије упису у Excel као што то ради pandas:
+# NaN постаје празна ћелија, а бесконачност текст 'inf'/'-inf'
+def excel_value(value):
+    if isinstance(value, float) and not np.isfinite(value):
+        return None if np.isnan(value) else ('inf' if value > 0 else '-inf')
+    return value
+
+# Класа конвертора који се подешава једном и користи за више докумената
+# Фонтови, поравнања, формат бројева и правила ширине колона се припремају при
+# креирању, а по документу се само извлаче редови и пуни радна свеска.
+# Конвертор после креирања нема променљиво стање (осим дељеног кеша стилова са
+# бравом), не покреће нити и не држи отворене датотеке, па се може користити из
+# више нити истовремено и наследити у процесима креираним са fork()
+class Converter:
+    """Конвертор Word → Excel са припремљеним стиловима и кешевима"""
+    
+    SHEET_NAME = 'Document Content'
+    NUMBER_FORMAT = '#,##0.00'
+    # Ширине колона: колоне 2, 3 и 4 су шире
+    WIDE_COLUMNS = (1, 2, 3)
+    WIDE_WIDTH = 30
+    DEFAULT_WIDTH = 20
+    
+    def __init__(self, fast_load=False, style_cache=None, jobs=1, nested=NESTED_INLINE,
+                 row_filter=None, compresslevel=None):
+        self.fast_load = fast_load
+        self.style_cache = style_cache
+        # Број процеса за извлачење великих докумената (1 = секвенцијално)
+        self.jobs = jobs
+        # Обрада табела угњеждених у ћелије (NESTED_INLINE или NESTED_ROWS)
+        self.nested = nested
+        # Филтер пасуса, табела и редова (RowFilter) или None за цео документ
+        self.row_filter = row_filter
+        # Ниво компресије .xlsx пакета (0 = без компресије, None = подразумевано)
+        self.compresslevel = compresslevel
+        # Палета фонтова по (величина, подебљање): 11 за редове табела, 12 за текст
+        self.fonts = {(size, bold): Font(name='Calibri', size=size, bold=bold)
+                      for size in (11, 12) for bold in (False, True)}
+        # Поравнања: обичан текст, текст са преламањем (друга колона) и бројеви
+        self.alignments = {
+            'text': Alignment(vertical='top', horizontal='left', wrap_text=False,
+                              shrink_to_fit=False),
+            'wrap': Alignment(vertical='top', horizontal='left', wrap_text=True,
+                              shrink_to_fit=False),
+            'number': Alignment(vertical='top', horizontal='center', wrap_text=False,
+                                shrink_to_fit=False),
+        }
+    
+    def column_width(self, col_idx):
+        return self.WIDE_WIDTH if col_idx in self.WIDE_COLUMNS else self.DEFAULT_WIDTH
+    
+    @staticmethod
+    def cell_kind(col_idx, value):
+        """Врста поравнања ћелије према колони и вредности"""
+        if col_idx == 2 and isinstance(value, (int, float)):
+            return 'number'
+        return 'wrap' if col_idx == 1 else 'text'
+    
+    def _style_arrays(self, worksheet):
+        """Припрема стилова ћелија за радну свеску
+        
+        Фонт, поравнање и формат броја се региструју у радној свесци једном по
+        комбинацији, а ћелије затим добијају копију готовог низа индекса стилова
+        уместо поређења објеката стила за сваку ћелију.
+        """
+        arrays = {}
+        for (size, bold), font in self.fonts.items():
+            for kind, alignment in self.alignments.items():
+                cell = Cell(worksheet)
+                cell.font = font
+                cell.alignment = alignment
+                if kind == 'number':
+                    cell.number_format = self.NUMBER_FORMAT
+                arrays[size, bold, kind] = cell._style
+        return arrays
+    
+    def extract(self, source, stats=None, profiler=None):
+        """Учитавање документа (путања, бајтови или фајл објекат) и извлачење редова"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        return read_rows(source, stats, self.fast_load, profiler, self.style_cache, self.jobs,
+                         self.nested, self.row_filter)
+    
+    def iter_rows(self, source):
+        """Учитавање документа и редови један по један, без складишта редова"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        doc = load_document(source, self.fast_load)
+        return extract_rows(doc, None, self.style_cache, self.nested, self.row_filter)
+    
+    def write(self, store, excel_file, profiler=None):
+        """Упис извучених редова у Excel датотеку или фајл објекат"""
+        profiler = profiler or NULL_PROFILER
+        try:
+            profiler.mark('workbook')
+            workbook = Workbook()
+            worksheet = workbook.active
+            worksheet.title = self.SHEET_NAME
+            styles = self._style_arrays(worksheet)
+            width = store.width()
             
-            # Подешавање ширине колона
-            for idx in range(final_df.shape[1]):
-                col_letter = chr(65 + idx) if idx < 26 else chr(64 + (idx//26)) + chr(65 + (idx%26))
-                if idx in [1, 2, 3]:  # Колоне 2, 3 и 4
-                    worksheet.column_dimensions[col_letter].width = 30  # Шире колоне
-                else:
-                    worksheet.column_dimensions[col_letter].width = 20  # Подразумевана ширина
+            for col_idx in range(width):
+                worksheet.column_dimensions[get_column_letter(col_idx + 1)].width = \
+                    self.column_width(col_idx)
+            # Друга колона се прелама, па су сви редови виши ако она постоји
+            row_height = 30 if width > 1 else 15
             
-            # Подешавање особина ћелија са Calibri фонтом
-            for row_idx, row in enumerate(worksheet.iter_rows()):
-                for col_idx, cell in enumerate(row):
-                    # Основно поравнање за све ћелије
-                    align_props = {
-                        'vertical': 'top',
-                        'horizontal': 'left',
-                        'wrap_text': True if col_idx == 1 else False,  # Омогућавање преламања текста за другу колону
-                        'shrink_to_fit': False
-                    }
-                    
-                    # Обрада форматирања бројева у трећој колони
-                    if col_idx == 2:
-                        if not format_number(cell, cell.value):
-                            cell.alignment = Alignment(**align_props)
+            for row_idx in range(len(store)):
+                values = store.row(row_idx)
+                # Ако ред има више колона, то је ред табеле (једноколонске табеле се форматирају као текст)
+                size = 11 if len(values) > 1 else 12
+                bolds = store.bolds(row_idx)
+                cells = []
+                for col_idx in range(width):
+                    if col_idx < len(values):
+                        value, bold = excel_value(values[col_idx]), bolds[col_idx]
                     else:
-                        cell.alignment = Alignment(**align_props)
-                    
-                    try:
-                        is_bold = is_bold_format[row_idx][col_idx]
-                    except IndexError:
-                        is_bold = False
-                        
-                    cell.font = Font(
-                        name='Calibri',
-                        size=11 if is_table[row_idx] else 12,
-                        bold=is_bold
-                    )
-                
-                # Increase height for rows with wrapped text
-                if any(cell.alignment.wrap_text for cell in row):
-                    worksheet.row_dimensions[row[0].row].height = 30
-                else:
-                    worksheet.row_dimensions[row[0].row].height = 15
+                        value, bold = None, False
+                    style = styles[size, bold, self.cell_kind(col_idx, value)]
+                    cells.append(Cell(worksheet, value=value, style_array=copy(style)))
+                worksheet.append(cells)
+                worksheet.row_dimensions[row_idx + 1].height = row_height
+            
+            # Чување и компресија
+            profiler.mark('save')
+            save_workbook(workbook, excel_file, self.compresslevel)
+            profiler.finish()
+        
+        except Exception as e:
+            profiler.finish()
+            print(f"Упозорење: Грешка при чувању датотеке: {str(e)}", file=sys.stderr)
+            return False
+        
+        return True
     
-    except Exception as e:
-        print(f"Упозорење: Грешка при чувању датотеке: {str(e)}")
-        return False
+    def convert(self, source, excel_file=None, stats=None, profiler=None):
+        """Конверзија једног документа
+        
+        Ако излаз није задат, враћа садржај .xlsx датотеке као бајтове (None при грешци).
+        """
+        store = self.extract(source, stats, profiler)
+        if excel_file is not None:
+            return self.write(store, excel_file, profiler)
+        buffer = io.BytesIO()
+        return buffer.getvalue() if self.write(store, buffer, profiler) else None
+
+# Подразумевани конвертори процеса по (брзо учитавање, ниво компресије);
+# конвертори за остале нивое компресије се креирају при првој употреби
+CONVERTERS = {(False, None): Converter(), (True, None): Converter(fast_load=True)}
+
+# Функција која враћа подразумевани конвертор процеса за задати режим
+def default_converter(fast_load=False, compresslevel=None):
+    key = (bool(fast_load), compresslevel)
+    converter = CONVERTERS.get(key)
+    if converter is None:
+        converter = CONVERTERS.setdefault(key, Converter(key[0], compresslevel=compresslevel))
+    return converter
+
+# Главна функција за конверзију Word документа у Excel
+# Обрађује текст и табеле, задржава форматирање и структуру документа
+def word_to_excel(word_file, excel_file, stats=None, profiler=None, fast_load=False,
+                  compresslevel=None):
+    return default_converter(fast_load, compresslevel).convert(word_file, excel_file, stats, profiler)
+
+# Формати излаза у режиму цеви
+STREAM_FORMATS = ('xlsx', 'csv', 'jsonl')
+
+# Функција за режим цеви: .docx са улазног тока, .xlsx или редови на излазни ток
+# Све се обавља у меморији, без привремених датотека
+def convert_stream(input_stream, output_stream, fmt='xlsx', converter=None):
+    """Конверзија документа са улазног на излазни бинарни ток"""
+    converter = converter or default_converter()
+    # ZIP формат захтева насумичан приступ, па се улаз учитава у меморију
+    source = io.BytesIO(input_stream.read())
     
+    if fmt == 'xlsx':
+        data = converter.convert(source)
+        if data is None:
+            return False
+        output_stream.write(data)
+        output_stream.flush()
+        return True
+    
+    rows = converter.iter_rows(source)
+    text_stream = io.TextIOWrapper(output_stream, encoding='utf-8', newline='',
+                                   write_through=True)
+    try:
+        if fmt == 'csv':
+            writer = csv.writer(text_stream)
+            for row_data, _, _, _ in rows:
+                writer.writerow(row_data)
+        else:
+            for row_data, row_format, _, _ in rows:
+                text_stream.write(json.dumps({'values': row_data, 'bold': row_format,
+                                              'table': len(row_data) > 1},
+                                             ensure_ascii=False) + '\n')
+        text_stream.flush()
+    finally:
+        # Излазни ток остаје отворен за позиваоца
+        text_stream.detach()
     return True
 
+# Класа за приказ напретка групне обраде у једном реду терминала
+# Приказује обрађене датотеке, редове/с, MB/с улаза и процену преосталог времена
+class Progress:
+    """Праћење и приказ напретка групне обраде"""
+    
+    # Најкраћи размак између два освежавања приказа (у секундама)
+    REFRESH_INTERVAL = 0.2
+    
+    def __init__(self, total_files, total_bytes, stream=None, enabled=True):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.stream = stream or sys.stdout
+        # Живи приказ само када је излаз терминал
+        self.enabled = enabled and self.stream.isatty()
+        self.files_done = 0
+        self.bytes_done = 0
+        self.rows_done = 0
+        self.started = time.perf_counter()
+        self._last_draw = 0.0
+        self._line_len = 0
+    
+    def update(self, input_bytes, rows):
+        """Бележење завршене датотеке и освежавање приказа"""
+        self.files_done += 1
+        self.bytes_done += input_bytes
+        self.rows_done += rows
+        now = time.perf_counter()
+        if now - self._last_draw >= self.REFRESH_INTERVAL or self.files_done == self.total_files:
+            self._last_draw = now
+            self.draw()
+    
+    def status_line(self):
+        """Формирање линије са тренутним стањем обраде"""
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        rows_rate = self.rows_done / elapsed
+        mb_rate = self.bytes_done / elapsed / (1024 * 1024)
+        # Процена преосталог времена на основу брзине читања улаза
+        if self.bytes_done:
+            eta = (self.total_bytes - self.bytes_done) * elapsed / self.bytes_done
+            eta_text = time.strftime('%H:%M:%S', time.gmtime(eta))
+        else:
+            eta_text = '--:--:--'
+        return (f"[{self.files_done}/{self.total_files}] "
+                f"{rows_rate:.0f} ред/с, {mb_rate:.2f} MB/с, преостало {eta_text}")
+    
+    def draw(self):
+        """Исцртавање линије напретка преко претходне"""
+        if not self.enabled:
+            return
+        line = self.status_line()
+        self.stream.write('\r' + line.ljust(self._line_len))
+        self.stream.flush()
+        self._line_len = len(line)
+    
+    def clear(self):
+        """Брисање линије напретка пре исписа обичне поруке"""
+        if self.enabled and self._line_len:
+            self.stream.write('\r' + ' ' * self._line_len + '\r')
+            self.stream.flush()
+            self._line_len = 0
+    
+    def message(self, text):
+        """Испис поруке без кварења линије напретка"""
+        self.clear()
+        print(text, file=self.stream)
+        self.draw()
+
+# Функција за атомичан упис Excel датотеке
+# Резултат се прво уписује у привремену датотеку у истом директоријуму па преименује
+def write_excel_atomic(store, excel_file, profiler=None, converter=None):
+    """Упис редова са атомичном заменом излазне датотеке"""
+    excel_file = Path(excel_file)
+    tmp_file = excel_file.with_name(f".{excel_file.stem}.{uuid.uuid4().hex}.tmp.xlsx")
+    try:
+        success = (converter or default_converter()).write(store, tmp_file, profiler)
+        if success:
+            os.replace(tmp_file, excel_file)
+        return success
+    finally:
+        # Уклањање привремене датотеке ако замена није обављена
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+# Верзија конвертора – мења се када се промени излаз или мета-подаци, чиме се поништава кеш
+CONVERTER_VERSION = 3
+
+# Функција која враћа подешавања која утичу на излаз (део кључа кеша)
+def conversion_settings(args=None):
+    row_filter = row_filter_from_args(args)
+    return {'version': CONVERTER_VERSION,
+            'nested': getattr(args, 'nested', NESTED_INLINE),
+            'filter': row_filter.settings() if row_filter else None,
+            'compresslevel': compresslevel_from_args(args)}
+
+# Функција која враћа ниво компресије из аргумената (--fast-save је ниво 0)
+def compresslevel_from_args(args=None):
+    if getattr(args, 'fast_save', False):
+        return 0
+    return getattr(args, 'compress_level', None)
+
+# Функција која креира филтер извлачења из аргумената (None ако филтер није задат)
+def row_filter_from_args(args=None):
+    tables_only = getattr(args, 'tables_only', False)
+    tables = getattr(args, 'tables', None)
+    amounts = getattr(args, 'amounts_only', False)
+    if not (tables_only or tables is not None or amounts):
+        return None
+    return RowFilter(tables_only, tables, amounts)
+
+# Функција која отвара кеш задат аргументима (None ако кеш није задат)
+def output_cache_from_args(args):
+    if not args.cache_dir:
+        return None
+    max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None
+    return OutputCache(args.cache_dir, max_bytes)
+
+# Класа за кеш излазних датотека адресиран садржајем
+# Кључ је хеш улазне датотеке и подешавања, а вредност генерисана .xlsx датотека;
+# дупликати се задовољавају тврдом везом или копијом уместо поновне конверзије.
+# У поддиректоријуму rows/ су хешеви редова за поређење ревизија (--diff), који
+# деле ограничење величине и LRU избацивање са генерисаним датотекама
+class OutputCache:
+    """Кеш генерисаних .xlsx датотека са LRU избацивањем према величини"""
+    
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Почетна величина кеша; касније се само ажурира
+        self.size = sum(path.stat().st_size for path in self._entries())
+        # Кеш се своди на ограничење и када се у обради само чита из њега
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.evict()
+    
+    @staticmethod
+    def key(source, settings):
+        """Израчунавање кључа из садржаја датотеке (путања или бајтови) и подешавања"""
+        digest = hashlib.sha256()
+        if isinstance(source, (bytes, bytearray)):
+            digest.update(source)
+        else:
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _paths(self, key):
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.xlsx", folder / f"{key}.json"
+    
+    def _rows_path(self, key):
+        return self.cache_dir / 'rows' / key[:2] / f"{key}.json"
+    
+    def _entries(self):
+        # Уноси који се броје у величину кеша: .xlsx датотеке и хешеви редова
+        yield from self.cache_dir.glob('*/*.xlsx')
+        yield from self.cache_dir.glob('rows/*/*.json')
+    
+    def _added(self, path, replaced):
+        """Ажурирање величине после уписа уноса и избацивање ако је кеш пун"""
+        self.size += path.stat().st_size - replaced
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            self.evict()
+    
+    def fetch(self, key, excel_file):
+        """Постављање кешираног резултата на излазну путању; враћа мета-податке или None"""
+        entry, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            # Освежавање времена приступа за LRU редослед
+            os.utime(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        excel_file = Path(excel_file)
+        tmp_file = excel_file.with_name(f".{excel_file.stem}.{uuid.uuid4().hex}.tmp.xlsx")
+        try:
+            try:
+                os.link(entry, tmp_file)
+            except OSError:
+                # Различити уређаји или систем без тврдих веза
+                shutil.copyfile(entry, tmp_file)
+            os.replace(tmp_file, excel_file)
+        except FileNotFoundError:
+            # Унос је избачен у међувремену
+            self.misses += 1
+            return None
+        finally:
+            if tmp_file.exists():
+                tmp_file.unlink()
+        self.hits += 1
+        return meta
+    
+    def store(self, key, excel_file, meta):
+        """Чување генерисане датотеке у кешу"""
+        entry, meta_path = self._paths(key)
+        entry.parent.mkdir(exist_ok=True)
+        token = uuid.uuid4().hex
+        tmp_entry = entry.with_name(f".{token}.tmp")
+        tmp_meta = meta_path.with_name(f".{token}.meta.tmp")
+        shutil.copyfile(excel_file, tmp_entry)
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        # Величина уноса који се замењује (нпр. у режиму базе, где се кеш не чита)
+        try:
+            replaced = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        # Датотека пре мета-података: унос без мета-података се не сматра поготком
+        os.replace(tmp_entry, entry)
+        os.replace(tmp_meta, meta_path)
+        self._added(entry, replaced)
+    
+    def fetch_rows(self, key):
+        """Хешеви редова документа из кеша (RowHashes) или None"""
+        path = self._rows_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                hashes = RowHashes.from_json(json.load(f))
+            # Освежавање времена приступа за LRU редослед
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return hashes
+    
+    def store_rows(self, key, hashes):
+        """Чување хешева редова документа у кешу"""
+        path = self._rows_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = path.with_name(f".{path.stem}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(hashes.to_json(), f, ensure_ascii=False)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_file, path)
+        self._added(path, replaced)
+    
+    def evict(self):
+        """Избацивање најдуже некоришћених уноса док кеш не стане у ограничење"""
+        entries = []
+        for path in self._entries():
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            victims = (path.with_suffix('.json'), path) if path.suffix == '.xlsx' else (path,)
+            for victim in victims:
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+            self.size -= size
+            self.evictions += 1
+    
+    def summary(self):
+        """Кратак извештај о погоцима и промашајима"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f"Кеш: {self.hits} погодака, {self.misses} промашаја ({rate:.1f}%), "
+                f"{self.evictions} избачених, {self.size / (1024 * 1024):.1f} MB")
+
+# Класа са хешевима и вредностима редова документа за поређење ревизија
+# Празни редови око табела се изостављају; ред је број реда у конвертованом листу
+class RowHashes:
+    """Редови документа сведени на хешеве, табеле, вредности и подебљање"""
+    
+    __slots__ = ('hashes', 'tables', 'rows', 'values', 'bolds')
+    
+    def __init__(self, hashes, tables, rows, values, bolds):
+        self.hashes = hashes
+        self.tables = tables
+        self.rows = rows
+        self.values = values
+        self.bolds = bolds
+    
+    @staticmethod
+    def row_hash(values, bolds):
+        data = json.dumps([values, bolds], ensure_ascii=False).encode('utf-8')
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+    
+    @classmethod
+    def from_store(cls, store):
+        hashes, tables, rows, values, bolds = [], [], [], [], []
+        for row_idx in range(len(store)):
+            if store.kinds[row_idx] == ROW_SPACER:
+                continue
+            row = [excel_value(value) for value in store.row(row_idx)]
+            row_bolds = store.bolds(row_idx)
+            hashes.append(cls.row_hash(row, row_bolds))
+            tables.append(store.tables[row_idx])
+            rows.append(row_idx + 1)
+            values.append(row)
+            bolds.append(row_bolds)
+        return cls(hashes, tables, rows, values, bolds)
+    
+    def to_json(self):
+        return {'hashes': self.hashes, 'tables': self.tables, 'rows': self.rows,
+                'values': self.values, 'bolds': self.bolds}
+    
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['hashes'], data['tables'], data['rows'], data['values'], data['bolds'])
+    
+    def blocks(self):
+        """Узастопни редови исте табеле (или пасуси између табела) као опсези"""
+        blocks = []
+        start = 0
+        for idx in range(1, len(self.hashes) + 1):
+            if idx == len(self.hashes) or self.tables[idx] != self.tables[start]:
+                blocks.append((start, idx))
+                start = idx
+        return blocks
+
+# Функција која учитава хешеве редова документа, из кеша (OutputCache) ако је
+# исти садржај већ виђен; кључ се рачуна као код кеша излаза
+def load_row_hashes(word_file, converter, cache=None, settings=None):
+    if cache is not None:
+        key = cache.key(word_file, settings)
+        hashes = cache.fetch_rows(key)
+        if hashes is not None:
+            return hashes, True
+    hashes = RowHashes.from_store(converter.extract(word_file))
+    if cache is not None:
+        cache.store_rows(key, hashes)
+    return hashes, False
+
+# Функција која пореди редове две ревизије документа
+# Прво се поравнавају блокови (табеле и пасуси између њих) према хешу целог блока,
+# а затим редови унутар упарених блокова који се разликују; враћа само додате,
+# уклоњене и измењене редове
+def diff_rows(old, new):
+    changes = []
+    
+    def record(change, old_idx=None, new_idx=None):
+        source = new if new_idx is not None else old
+        idx = new_idx if new_idx is not None else old_idx
+        table = source.tables[idx]
+        changes.append({
+            'change': change,
+            # Табеле се броје од 1, као у --tables и у радној свесци разлика
+            'table': table + 1 if table >= 0 else None,
+            'old_row': old.rows[old_idx] if old_idx is not None else None,
+            'new_row': new.rows[new_idx] if new_idx is not None else None,
+            'old': old.values[old_idx] if old_idx is not None else None,
+            'new': new.values[new_idx] if new_idx is not None else None,
+            'old_bold': old.bolds[old_idx] if old_idx is not None else None,
+            'new_bold': new.bolds[new_idx] if new_idx is not None else None,
+        })
+    
+    def compare(old_range, new_range):
+        (old_start, old_end), (new_start, new_end) = old_range, new_range
+        matcher = difflib.SequenceMatcher(None, old.hashes[old_start:old_end],
+                                          new.hashes[new_start:new_end], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+            for k in range(paired):
+                record('changed', old_start + i1 + k, new_start + j1 + k)
+            for k in range(i1 + paired, i2):
+                record('removed', old_idx=old_start + k)
+            for k in range(j1 + paired, j2):
+                record('added', new_idx=new_start + k)
+    
+    old_blocks, new_blocks = old.blocks(), new.blocks()
+    block_key = lambda rows, block: hashlib.blake2b(
+        ''.join(rows.hashes[block[0]:block[1]]).encode('ascii'), digest_size=8).digest()
+    matcher = difflib.SequenceMatcher(None, [block_key(old, b) for b in old_blocks],
+                                      [block_key(new, b) for b in new_blocks], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        # Упарују се само блокови исте врсте (табела са табелом, пасуси са пасусима),
+        # у редоследу документа; остали блокови су уклоњени, односно додати
+        kinds = difflib.SequenceMatcher(None, [old.tables[start] >= 0 for start, _ in old_blocks[i1:i2]],
+                                        [new.tables[start] >= 0 for start, _ in new_blocks[j1:j2]],
+                                        autojunk=False)
+        for kind_tag, a1, a2, b1, b2 in kinds.get_opcodes():
+            if kind_tag == 'equal':
+                for k in range(a2 - a1):
+                    compare(old_blocks[i1 + a1 + k], new_blocks[j1 + b1 + k])
+                continue
+            for block in old_blocks[i1 + a1:i1 + a2]:
+                compare(block, (0, 0))
+            for block in new_blocks[j1 + b1:j1 + b2]:
+                compare((0, 0), block)
+    return changes
+
+# Боје редова у радној свесци разлика
+DIFF_FILLS = {'added': 'C6EFCE', 'removed': 'FFC7CE', 'changed': 'FFEB9C'}
+DIFF_LABELS = {'added': 'додато', 'removed': 'уклоњено', 'changed': 'измењено'}
+
+# Функција која уписује разлике у JSON или компактну радну свеску (према екстензији)
+# У радној свесци измењен ред има две линије: стару и нову вредност
+def write_diff(path, old_name, new_name, changes):
+    counts = {change: sum(1 for c in changes if c['change'] == change) for change in DIFF_LABELS}
+    if path is None or Path(path).suffix.lower() != '.xlsx':
+        # Једна промена по линији
+        header = json.dumps({'old': str(old_name), 'new': str(new_name), **counts},
+                            ensure_ascii=False)
+        rows = ',\n'.join(' ' + json.dumps(change, ensure_ascii=False) for change in changes)
+        text = header[:-1] + ', "rows": [' + (f"\n{rows}\n" if changes else '') + ']}'
+        if path is None:
+            print(text)
+        else:
+            Path(path).write_text(text + '\n', encoding='utf-8')
+        return counts
+    
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Разлике'
+    width = max((len(c['old'] or c['new'] or []) for c in changes), default=0)
+    bold = Font(name='Calibri', size=11, bold=True)
+    worksheet.append(['Промена', 'Табела', 'Стари ред', 'Нови ред'] +
+                     [f"Колона {idx + 1}" for idx in range(width)])
+    for cell in worksheet[1]:
+        cell.font = bold
+    for change in changes:
+        fill = PatternFill('solid', fgColor=DIFF_FILLS[change['change']])
+        lines = [('old', change['old'], change['old_bold']),
+                 ('new', change['new'], change['new_bold'])]
+        for side, values, bolds in lines:
+            if values is None:
+                continue
+            label = DIFF_LABELS[change['change']]
+            if change['change'] == 'changed':
+                label += ' (старо)' if side == 'old' else ' (ново)'
+            worksheet.append([label, change['table'], change['old_row'], change['new_row']] + values)
+            row_cells = worksheet[worksheet.max_row][:4 + len(values)]
+            for cell in row_cells:
+                cell.fill = fill
+            for cell, is_bold in zip(row_cells[4:], bolds):
+                if is_bold:
+                    cell.font = bold
+                if isinstance(cell.value, (int, float)):
+                    cell.number_format = Converter.NUMBER_FORMAT
+    worksheet.column_dimensions['A'].width = 18
+    for col_idx in range(width):
+        worksheet.column_dimensions[get_column_letter(col_idx + 5)].width = 30
+    worksheet.freeze_panes = 'A2'
+    workbook.save(path)
+    return counts
+
+# Непромењиви делови пакета главне радне свеске у режиму додавања
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Табела стилова главне радне свеске: фонтови (Calibri 11/12, обичан/подебљан)
+# и три врсте поравнања (обично, преламање у другој колони, број у трећој колони)
+_MASTER_FONTS = [(11, False), (12, False), (11, True), (12, True)]
+_ALIGN_PLAIN, _ALIGN_WRAP, _ALIGN_NUMBER = range(3)
+
+def _master_styles_xml():
+    fonts = ''.join(
+        f'<font>{"<b/>" if bold else ""}<sz val="{size}"/><name val="Calibri"/><family val="2"/></font>'
+        for size, bold in [(11, False)] + _MASTER_FONTS)
+    xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+    for font_id in range(1, len(_MASTER_FONTS) + 1):
+        xfs.append(f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" xfId="0" '
+                   f'applyFont="1" applyAlignment="1"><alignment horizontal="left" vertical="top"/></xf>')
+        xfs.append(f'<xf numFmtId="0" fontId="{font_id}" fillId="0" borderId="0" xfId="0" '
+                   f'applyFont="1" applyAlignment="1"><alignment horizontal="left" vertical="top" wrapText="1"/></xf>')
+        # numFmtId 4 је уграђени формат '#,##0.00'
+        xfs.append(f'<xf numFmtId="4" fontId="{font_id}" fillId="0" borderId="0" xfId="0" '
+                   f'applyNumberFormat="1" applyFont="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>')
+    return (f'{_XML_HEADER}<styleSheet xmlns="{_MAIN_NS}">'
+            f'<fonts count="{len(_MASTER_FONTS) + 1}">{fonts}</fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>')
+
+# Функција која враћа индекс стила ћелије у табели стилова главне радне свеске
+def _master_style(size, bold, align):
+    return 1 + _MASTER_FONTS.index((size, bold)) * 3 + align
+
+# Знакови које XML 1.0 не дозвољава (openpyxl их одбија, овде се уклањају)
+_ILLEGAL_XML = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+# Функција која генерише XML листа са истим форматирањем као word_to_excel
+# Вредности се уписују као уметнути текст, тако да се дељени стрингови не мењају
+def worksheet_xml(store):
+    width = store.width()
+    parts = [f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}">']
+    if width:
+        parts.append('<cols>')
+        for idx in range(width):
+            col_width = 30 if idx in [1, 2, 3] else 20
+            parts.append(f'<col min="{idx + 1}" max="{idx + 1}" width="{col_width}" customWidth="1"/>')
+        parts.append('</cols>')
+    parts.append('<sheetData>')
+    letters = [get_column_letter(idx + 1) for idx in range(width)]
+    # Ред са другом колоном увек има преломљен текст
+    height = 30 if width > 1 else 15
+    for row_idx, row_data in enumerate(store, start=1):
+        size = 11 if len(row_data) > 1 else 12
+        row_format = store.bolds(row_idx - 1)
+        parts.append(f'<row r="{row_idx}" ht="{height}" customHeight="1">')
+        for col_idx in range(width):
+            # NaN постаје празна ћелија, а бесконачност текст, као у Converter.write
+            value = excel_value(row_data[col_idx]) if col_idx < len(row_data) else None
+            bold = row_format[col_idx] if col_idx < len(row_format) else False
+            ref = f'{letters[col_idx]}{row_idx}'
+            if col_idx == 2 and isinstance(value, (int, float)):
+                style = _master_style(size, bold, _ALIGN_NUMBER)
+                parts.append(f'<c r="{ref}" s="{style}"><v>{value!r}</v></c>')
+                continue
+            style = _master_style(size, bold, _ALIGN_WRAP if col_idx == 1 else _ALIGN_PLAIN)
+            text = '' if value is None else str(value).translate(_ILLEGAL_XML)
+            if text:
+                parts.append(f'<c r="{ref}" s="{style}" t="inlineStr"><is>'
+                             f'<t xml:space="preserve">{escape(text)}</t></is></c>')
+            else:
+                parts.append(f'<c r="{ref}" s="{style}"/>')
+        parts.append('</row>')
+    parts.append('</sheetData></worksheet>')
+    return ''.join(parts)
+
+# Класа за инкрементално додавање докумената у главну радну свеску
+# Сваки документ постаје нов лист (засебан део ZIP пакета); постојећи листови
+# се не читају нити поново пишу, већ се мењају само мали делови са списком листова.
+# Помоћни индекс (<главна>.index.json) чува листове, број редова и отисак датотеке
+class MasterWorkbook:
+    """Главна радна свеска у коју се додају листови без поновног уписа целе датотеке"""
+    
+    # Делови пакета који се поново генеришу при сваком додавању
+    DIRECTORY_PARTS = ('[Content_Types].xml', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels')
+    # Удео напуштених бајтова после којег се пакет сажима
+    COMPACT_RATIO = 0.25
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + '.index.json')
+        if self.path.exists():
+            if not self.index_path.exists():
+                raise ValueError(f"{self.path.name} нема индекс ({self.index_path.name}); "
+                                 f"главна радна свеска мора бити креирана режимом додавања")
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+            if self.index.get('pending'):
+                self._recover(self.index.pop('pending'))
+            if self.index['fingerprint'] != self._fingerprint():
+                raise ValueError(f"{self.path.name} је измењена ван алата – индекс више не важи")
+        else:
+            self.index = {'sheets': [], 'next_id': 1, 'orphan_bytes': 0, 'fingerprint': None}
+    
+    def _recover(self, pending):
+        """Враћање пакета после прекинутог додавања или сажимања"""
+        if 'tail' in pending:
+            # Додавање је почело: стари централни директоријум се враћа на своје место,
+            # а све што је дописано после њега се одбацује
+            self._restore_tail(pending)
+        else:
+            # Сажимање: сажети пакет је потпун, па се замена довршава ако није обављена
+            tmp_path = self.path.with_name(pending['replace'])
+            if tmp_path.exists():
+                os.replace(tmp_path, self.path)
+            if self._fingerprint() != pending['fingerprint']:
+                raise ValueError(f"{self.path.name} је измењена ван алата – индекс више не важи")
+            self.index['orphan_bytes'] = 0
+        self._save_index()
+    
+    def _restore_tail(self, pending):
+        with open(self.path, 'r+b') as f:
+            f.seek(pending['offset'])
+            f.write(base64.b64decode(pending['tail']))
+            f.truncate()
+    
+    def _begin_append(self):
+        """Чување старог централног директоријума у индексу пре дописивања"""
+        with zipfile.ZipFile(self.path) as zf:
+            offset = zf.start_dir
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        pending = {'offset': offset, 'tail': base64.b64encode(tail).decode('ascii')}
+        self.index['pending'] = pending
+        self._save_index(self.index['fingerprint'])
+        return pending
+    
+    def _fingerprint(self):
+        st = self.path.stat()
+        return [st.st_size, st.st_mtime_ns]
+    
+    def _sheet_name(self, name):
+        """Јединствено име листа у складу са ограничењима Excel-а"""
+        base = ''.join('_' if c in '[]:*?/\\' else c for c in name)[:31] or 'Лист'
+        taken = {sheet['name'].lower() for sheet in self.index['sheets']}
+        candidate, counter = base, 1
+        while candidate.lower() in taken:
+            counter += 1
+            suffix = f" ({counter})"
+            candidate = base[:31 - len(suffix)] + suffix
+        return candidate
+    
+    def _directory_parts(self):
+        sheets = self.index['sheets']
+        overrides = ''.join(
+            f'<Override PartName="/{sheet["part"]}" ContentType="application/'
+            f'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>' for sheet in sheets)
+        content_types = (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>')
+        sheet_entries = ''.join(
+            f'<sheet name="{escape(sheet["name"], {chr(34): "&quot;"})}" sheetId="{sheet["id"]}" '
+            f'r:id="rId{sheet["id"]}"/>' for sheet in sheets)
+        workbook = (f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+                    f'<sheets>{sheet_entries}</sheets></workbook>')
+        relations = ''.join(
+            f'<Relationship Id="rId{sheet["id"]}" Type="{_REL_NS}/worksheet" '
+            f'Target="{sheet["part"][len("xl/"):]}"/>' for sheet in sheets)
+        workbook_rels = (f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">{relations}'
+                         f'<Relationship Id="rIdStyles" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+                         '</Relationships>')
+        return dict(zip(self.DIRECTORY_PARTS, (content_types, workbook, workbook_rels)))
+    
+    def append(self, name, store, source=None):
+        """Додавање редова једног документа као новог листа"""
+        previous = json.loads(json.dumps(self.index))
+        sheet_id = self.index['next_id']
+        sheet = {'name': self._sheet_name(name), 'id': sheet_id,
+                 'part': f'xl/worksheets/sheet{sheet_id}.xml', 'rows': len(store), 'source': source}
+        sheet_xml = worksheet_xml(store)
+        
+        if not self.path.exists():
+            self.index['sheets'].append(sheet)
+            self.index['next_id'] += 1
+            # Нов пакет се уписује у привремену датотеку, па прекид не оставља непотпун пакет
+            tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    zf.writestr('_rels/.rels', (
+                        f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">'
+                        f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+                        '</Relationships>'))
+                    zf.writestr('xl/styles.xml', _master_styles_xml())
+                    zf.writestr(sheet['part'], sheet_xml)
+                    for part, data in self._directory_parts().items():
+                        zf.writestr(part, data)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                self.index = previous
+                raise
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+            self._save_index()
+            return sheet['name']
+        
+        # Нови делови се дописују на место старог централног директоријума;
+        # старе верзије малих делова остају као напуштени бајтови у датотеци.
+        # Стари централни директоријум се претходно чува у индексу, тако да се
+        # пакет после грешке (или при следећем отварању, после пада) може вратити
+        pending = self._begin_append()
+        try:
+            self.index['sheets'].append(sheet)
+            self.index['next_id'] += 1
+            with zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED) as zf:
+                for part in self.DIRECTORY_PARTS:
+                    info = zf.NameToInfo.pop(part)
+                    zf.filelist.remove(info)
+                    self.index['orphan_bytes'] += info.compress_size + len(info.filename) + 30
+                zf.writestr(sheet['part'], sheet_xml)
+                for part, data in self._directory_parts().items():
+                    zf.writestr(part, data)
+        except BaseException:
+            self._restore_tail(pending)
+            self.index = previous
+            self._save_index()
+            raise
+        self.index.pop('pending')
+        self._save_index()
+        if self.index['orphan_bytes'] > self.path.stat().st_size * self.COMPACT_RATIO:
+            self.compact()
+        return sheet['name']
+    
+    def compact(self):
+        """Поновни упис пакета без напуштених бајтова (ретко, када их се накупи довољно)"""
+        tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with zipfile.ZipFile(self.path) as src, \
+                    zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as dst:
+                for info in src.infolist():
+                    dst.writestr(info, src.read(info))
+            # Замена се бележи у индексу, па се после пада довршава при следећем отварању
+            st = tmp_path.stat()
+            self.index['pending'] = {'replace': tmp_path.name,
+                                     'fingerprint': [st.st_size, st.st_mtime_ns]}
+            self._save_index(self.index['fingerprint'])
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            # Стари пакет је остао непромењен
+            self.index.pop('pending', None)
+            self._save_index()
+            raise
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.index.pop('pending')
+        self.index['orphan_bytes'] = 0
+        self._save_index()
+    
+    def _save_index(self, fingerprint=None):
+        self.index['fingerprint'] = fingerprint or self._fingerprint()
+        tmp_path = self.index_path.with_name(f".{self.index_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+# Шема базе извучених ћелија: документи и ћелије са положајем, подебљањем и износом;
+# ред и колона у листу, табела (као у --tables и --diff) и ред табеле броје се од 1
+ROW_DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    output TEXT,
+    tables INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    document INTEGER NOT NULL REFERENCES documents(id),
+    row INTEGER NOT NULL,
+    table_idx INTEGER,
+    table_row INTEGER,
+    col INTEGER NOT NULL,
+    bold INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    amount REAL
+);
+CREATE INDEX IF NOT EXISTS cells_document ON cells(document);
+"""
+
+# Верзија шеме (PRAGMA user_version); у верзији 0 табеле су бројане од 0
+ROW_DATABASE_VERSION = 1
+
+# FTS5 индекс над текстом ћелија (спољни садржај, без дуплирања текста)
+ROW_DATABASE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cells_fts USING fts5(
+    text, content='cells', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Класа за SQLite базу са свим извученим ћелијама
+# Ћелије документа се уносе у групама кроз executemany, а цела обрада је једна
+# трансакција која се потврђује при затварању; FTS5 индекс текста се допуњује
+# једним INSERT ... SELECT по документу, па претрага не захтева отварање .xlsx датотека
+class RowDatabase:
+    """SQLite база извучених ћелија са претрагом текста"""
+    
+    BATCH = 5000
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.executescript(ROW_DATABASE_SCHEMA)
+        self._migrate()
+        try:
+            self.connection.executescript(ROW_DATABASE_FTS)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite без FTS5 – претрага се обавља са LIKE
+            self.fts = False
+        self.documents = 0
+        self.cells = 0
+    
+    def _migrate(self):
+        """Превођење базе старије шеме на текућу"""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version >= ROW_DATABASE_VERSION:
+            return
+        with self.connection:
+            self.connection.execute("BEGIN")
+            if version < 1:
+                self.connection.execute(
+                    "UPDATE cells SET table_idx = table_idx + 1 WHERE table_idx IS NOT NULL")
+            self.connection.execute(f"PRAGMA user_version = {ROW_DATABASE_VERSION}")
+    
+    @staticmethod
+    def cell_records(document_id, store):
+        """Записи ћелија документа (ред и колона су бројеви у листу, од 1)"""
+        table_rows = {}
+        for row_idx in range(len(store)):
+            kind = store.kinds[row_idx]
+            if kind == ROW_SPACER:
+                continue
+            table = store.tables[row_idx]
+            table_row = None
+            if kind == ROW_TABLE:
+                table_row = table_rows[table] = table_rows.get(table, 0) + 1
+            for col_idx, value in enumerate(store.row(row_idx)):
+                value = excel_value(value)
+                if isinstance(value, float):
+                    text, amount = f"{value:.2f}", value
+                else:
+                    text, amount = value, None
+                if not text:
+                    continue
+                yield (document_id, row_idx + 1, table + 1 if table >= 0 else None, table_row,
+                       col_idx + 1, int(store.is_bold(row_idx, col_idx)), text, amount)
+    
+    def _delete(self, cursor, document_id):
+        if self.fts:
+            cursor.execute("INSERT INTO cells_fts(cells_fts, rowid, text) "
+                           "SELECT 'delete', rowid, text FROM cells WHERE document = ?",
+                           (document_id,))
+        cursor.execute("DELETE FROM cells WHERE document = ?", (document_id,))
+        cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+    
+    def add(self, name, store, output=None):
+        """Унос ћелија документа (претходни унос истог документа се замењује)"""
+        cursor = self.connection.cursor()
+        if not self.connection.in_transaction:
+            cursor.execute("BEGIN")
+        # Документ се уноси у тачки враћања: при грешци се одбацује само он,
+        # а претходни унос истог документа остаје
+        cursor.execute("SAVEPOINT document")
+        try:
+            old = cursor.execute("SELECT id FROM documents WHERE file = ?", (name,)).fetchone()
+            if old:
+                self._delete(cursor, old[0])
+            tables = len({table for table in store.tables if table >= 0})
+            cursor.execute("INSERT INTO documents(file, output, tables, rows) VALUES (?, ?, ?, ?)",
+                           (name, output, tables, len(store)))
+            document_id = cursor.lastrowid
+            records = self.cell_records(document_id, store)
+            cells = 0
+            while True:
+                batch = list(islice(records, self.BATCH))
+                if not batch:
+                    break
+                cursor.executemany("INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                cells += len(batch)
+            if self.fts:
+                cursor.execute("INSERT INTO cells_fts(rowid, text) "
+                               "SELECT rowid, text FROM cells WHERE document = ?", (document_id,))
+        except BaseException:
+            cursor.execute("ROLLBACK TO document")
+            cursor.execute("RELEASE document")
+            raise
+        cursor.execute("RELEASE document")
+        self.documents += 1
+        self.cells += cells
+        return cells
+    
+    def search(self, query, limit=20):
+        """Претрага текста ћелија; враћа (документ, ред, колона, текст, износ)"""
+        select = ("SELECT d.file, c.row, c.col, c.text, c.amount FROM cells c "
+                  "JOIN documents d ON d.id = c.document ")
+        if self.fts:
+            # Упит се тражи као фраза, па цртице у бројевима рачуна нису оператори
+            phrase = '"' + query.replace('"', '""') + '"'
+            sql = (select + "JOIN cells_fts f ON f.rowid = c.rowid "
+                   "WHERE cells_fts MATCH ? ORDER BY f.rank LIMIT ?")
+            return self.connection.execute(sql, (phrase, limit)).fetchall()
+        sql = select + "WHERE c.text LIKE ? ORDER BY d.file, c.row, c.col LIMIT ?"
+        return self.connection.execute(sql, (f"%{query}%", limit)).fetchall()
+    
+    def close(self):
+        """Потврда трансакције и затварање базе"""
+        if self.connection.in_transaction:
+            self.connection.commit()
+        self.connection.close()
+    
+    def summary(self):
+        return f"SQLite: {self.documents} докумената, {self.cells} ћелија → {self.path}"
+
+# Класа за координацију више радника (машина) преко дељеног директоријума
+# Радник преузима датотеку атомичним креирањем .lock датотеке (закуп),
+# закуп се периодично обнавља, а закупи умрлих радника истичу и преузимају се
+class WorkLeases:
+    """Закупи датотека у дељеном радном директоријуму"""
+    
+    def __init__(self, work_dir, ttl=300.0, worker_id=None):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._held = {}  # име датотеке → токен закупа
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _paths(self, name):
+        # Име је путања у односу на улазни директоријум; '/' (и '%' ради једнозначности)
+        # се кодирају, тако да сви закупи остају у самом радном директоријуму
+        name = name.replace('%', '%25').replace('/', '%2F')
+        return self.work_dir / f"{name}.lock", self.work_dir / f"{name}.done"
+    
+    def _read_token(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f).get('token')
+        except (OSError, ValueError):
+            return None
+    
+    def _is_stale(self, path):
+        try:
+            return time.time() - path.stat().st_mtime > self.ttl
+        except FileNotFoundError:
+            return True
+    
+    def _create(self, lock_path):
+        """Атомично креирање закупа (успева само један радник)"""
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker_id, 'host': socket.gethostname(),
+                       'pid': os.getpid(), 'token': token, 'claimed': time.time()}, f)
+        return token
+    
+    def _reclaim(self, lock_path):
+        """Преузимање истеклог закупа умрлог радника"""
+        token = self._read_token(lock_path)
+        if not self._is_stale(lock_path):
+            return False
+        # Истекли закуп се склања преименовањем – успева само један радник
+        aside = lock_path.with_name(f"{lock_path.name}.{uuid.uuid4().hex}.stale")
+        try:
+            os.rename(lock_path, aside)
+        except FileNotFoundError:
+            return True
+        # Ако је у међувремену неко други преузео закуп, враћамо га
+        if self._read_token(aside) != token:
+            try:
+                os.link(aside, lock_path)
+            except OSError:
+                pass
+            aside.unlink()
+            return False
+        aside.unlink()
+        return True
+    
+    def claim(self, name):
+        """Покушај преузимања датотеке; враћа True ако је закуп наш"""
+        lock_path, done_path = self._paths(name)
+        if done_path.exists():
+            return False
+        token = self._create(lock_path)
+        if token is None:
+            if not self._reclaim(lock_path):
+                return False
+            token = self._create(lock_path)
+            if token is None:
+                return False
+        # Датотека је можда завршена између провере и креирања закупа
+        if done_path.exists():
+            lock_path.unlink()
+            return False
+        with self._lock:
+            self._held[name] = token
+        return True
+    
+    def _release(self, name):
+        lock_path, _ = self._paths(name)
+        with self._lock:
+            token = self._held.pop(name, None)
+        # Закуп се брише само ако је и даље наш
+        if token is not None and self._read_token(lock_path) == token:
+            lock_path.unlink()
+    
+    def complete(self, name, record=None):
+        """Означавање датотеке као завршене и ослобађање закупа"""
+        _, done_path = self._paths(name)
+        tmp_path = done_path.with_name(f".{done_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker_id, 'finished': time.time(), **(record or {})},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, done_path)
+        self._release(name)
+    
+    def release(self, name):
+        """Ослобађање закупа без означавања (нпр. после грешке)"""
+        self._release(name)
+    
+    def _heartbeat(self):
+        # Обнављање свих наших закупа на трећину рока трајања
+        while not self._stop.wait(self.ttl / 3):
+            with self._lock:
+                names = list(self._held)
+            for name in names:
+                lock_path, _ = self._paths(name)
+                try:
+                    os.utime(lock_path)
+                except FileNotFoundError:
+                    pass
+    
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        for name in list(self._held):
+            self._release(name)
+
+# Поља манифеста у редоследу у ком се уписују у CSV
+MANIFEST_FIELDS = ['file', 'output', 'input_bytes', 'tables', 'rows', 'seconds', 'status', 'error']
+
+# Функција за упис манифеста обраде у JSON или CSV датотеку
+# Формат се бира према екстензији излазне датотеке
+def write_manifest(path, records):
+    """Упис манифеста обраде (JSON или CSV према екстензији)"""
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+
+# Функција за упис збирног прегледа износа по документима и укупно
+# Користи бројаче које је конверзија већ израчунала, без поновног читања радних свесака
+def write_summary(path, records):
+    """Упис збирног прегледа (CSV или .xlsx према екстензији)"""
+    documents = [r for r in records if r['status'] in ('ok', 'cached')]
+    totals = np.array([r.get('amount_total', 0.0) for r in documents], dtype=np.float64)
+    rows = [[r['file'], r.get('table_rows', 0), r.get('amount_rows', 0),
+             r.get('unparsed_amounts', 0), r.get('amount_total', 0.0)] for r in documents]
+    rows.append(['УКУПНО', sum(r[1] for r in rows), sum(r[2] for r in rows),
+                 sum(r[3] for r in rows), round(float(totals.sum()), 2)])
+    header = ['Документ', 'Редова табела', 'Износа', 'Непрепознатих износа', 'Укупно']
+    path = Path(path)
+    if path.suffix.lower() == '.xlsx':
+        summary_df = pd.DataFrame(rows, columns=header)
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            summary_df.to_excel(writer, sheet_name='Збир', index=False)
+            worksheet = writer.sheets['Збир']
+            worksheet.column_dimensions['A'].width = 40
+            for cell in worksheet['E'][1:]:
+                cell.number_format = '#,##0.00'
+            for cell in worksheet[worksheet.max_row]:
+                cell.font = Font(name='Calibri', size=11, bold=True)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    return rows[-1]
+
+# Функција за обраду аргумената командне линије
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Конверзија Word докумената у Excel табеле')
+    parser.add_argument('files', nargs='*', metavar='ДАТОТЕКА',
+                        help='.docx датотеке за обраду; „-“ чита документ са улаза и пише на излаз')
+    parser.add_argument('--format', choices=STREAM_FORMATS, default='xlsx',
+                        help='формат излаза у режиму цеви (подразумевано xlsx)')
+    parser.add_argument('--manifest', metavar='ПУТАЊА',
+                        help='упис манифеста обраде по датотекама (.json или .csv)')
+    parser.add_argument('--no-progress', action='store_true',
+                        help='искључивање живог приказа напретка')
+    parser.add_argument('--input', default='.', metavar='ДИР',
+                        help='директоријум са .docx датотекама (подразумевано тренутни)')
+    parser.add_argument('--output', default='ex', metavar='ДИР',
+                        help='излазни директоријум (подразумевано ex)')
+    parser.add_argument('--work-dir', metavar='ДИР',
+                        help='дељени радни директоријум за координацију више радника')
+    parser.add_argument('--lease-ttl', type=float, default=300.0, metavar='СЕК',
+                        help='трајање закупа датотеке пре него што га други радник преузме')
+    parser.add_argument('--cache-dir', metavar='ДИР',
+                        help='кеш генерисаних датотека адресиран садржајем улаза')
+    parser.add_argument('--cache-max-mb', type=float, metavar='MB',
+                        help='највећа величина кеша; најдуже некоришћени уноси се избацују')
+    parser.add_argument('--profile-memory', metavar='ПУТАЊА',
+                        help='профилисање меморије по фазама и датотекама, извештај у JSON')
+    parser.add_argument('--append', metavar='ГЛАВНА.xlsx',
+                        help='додавање сваког документа као новог листа главне радне свеске')
+    parser.add_argument('--sqlite', metavar='БАЗА.db',
+                        help='унос свих извучених ћелија у SQLite базу са FTS5 индексом текста')
+    parser.add_argument('--search', metavar='ИЗРАЗ',
+                        help='претрага текста у бази задатој са --sqlite (без конверзије)')
+    parser.add_argument('--diff', nargs=2, metavar=('СТАРИ', 'НОВИ'),
+                        help='поређење редова две ревизије документа (без конверзије)')
+    parser.add_argument('--diff-output', metavar='ПУТАЊА',
+                        help='излаз поређења: .json или .xlsx (подразумевано JSON на стандардни излаз)')
+    parser.add_argument('--summary', metavar='ПУТАЊА',
+                        help='збирни преглед износа из треће колоне по документима (.csv или .xlsx)')
+    parser.add_argument('--fast-load', action='store_true',
+                        help='учитавање само тела, стилова и нумерације (без слика и осталих делова)')
+    parser.add_argument('--compress-level', type=int, choices=COMPRESS_LEVELS, metavar='НИВО',
+                        help='ниво компресије .xlsx датотека: 0 без компресије, 1 најбрже, '
+                             '9 најмање (подразумевано 6)')
+    parser.add_argument('--fast-save', action='store_true',
+                        help='брзо чување без компресије (исто као --compress-level 0)')
+    parser.add_argument('--pipeline', type=int, nargs='?', const=2, default=0, metavar='ДУБИНА',
+                        help='проточна обрада: претходно читање и упис у посебним нитима '
+                             '(ДУБИНА је величина редова чекања, подразумевано 2)')
+    parser.add_argument('--nested', choices=NESTED_POLICIES, default=NESTED_INLINE,
+                        help='табеле угњеждене у ћелије: текст у ћелији родитеља (inline) '
+                             'или редови испод реда родитеља (rows)')
+    parser.add_argument('--tables-only', action='store_true',
+                        help='само табеле, без пасуса ван табела')
+    parser.add_argument('--tables', type=parse_table_list, metavar='СПИСАК',
+                        help='само задате табеле, бројане од 1 (нпр. 1,3-5)')
+    parser.add_argument('--amounts-only', action='store_true',
+                        help='само редови табела чија трећа колона је износ')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='паралелно извлачење великих докумената у N процеса '
+                             f'(од {PARALLEL_MIN_CELLS} ћелија навише)')
+    parser.add_argument('--style-cache', metavar='ПУТАЊА',
+                        help='трајни кеш обрађених стилова по шаблону (JSON)')
+    parser.add_argument('--worker-id', help='ознака радника у закупима (подразумевано рачунар-pid)')
+    return parser.parse_args(argv)
+
+# Класа која води групну обраду: конверзију датотека, манифест, закупе и напредак
+# Обрада једне датотеке је подељена на извлачење (учитавање и читање редова)
+# и упис (форматирање, чување и компресија), тако да се фазе могу преклапати
+class Batch:
+    """Групна конверзија датотека са заједничким подешавањима"""
+    
+    def __init__(self, output_dir, progress, cache=None, settings=None, profiler=None,
+                 master=None, leases=None, converter=None, database=None, input_dir='.'):
+        self.output_dir = output_dir
+        self.input_dir = Path(input_dir).resolve()
+        self.progress = progress
+        self.cache = cache
+        self.settings = settings
+        self.profiler = profiler
+        self.master = master
+        self.leases = leases
+        self.converter = converter or default_converter()
+        self.database = database
+        self.records = []
+    
+    def file_name(self, word_path):
+        """Име датотеке у манифесту и закупима: путања у односу на улазни директоријум
+        
+        Датотеке истог имена из различитих директоријума тако имају различите закупе.
+        """
+        try:
+            return word_path.resolve().relative_to(self.input_dir).as_posix()
+        except ValueError:
+            return word_path.as_posix()
+    
+    def claim(self, word_path):
+        """Преузимање датотеке (увек успева без координације)"""
+        return self.leases is None or self.leases.claim(self.file_name(word_path))
+    
+    def skip(self, word_path, input_bytes):
+        """Датотеку обрађује или је већ обрадио други радник"""
+        self.progress.total_files -= 1
+        self.progress.total_bytes -= input_bytes
+    
+    def _new_job(self, word_path, input_bytes):
+        # Излазна путања има исто име са .xlsx екстензијом и исти поддиректоријум као
+        # улаз у односу на --input, тако да се датотеке истог имена не преписују;
+        # датотеке ван улазног директоријума иду у сам излазни директоријум
+        name = self.file_name(word_path)
+        relative = Path(name)
+        if relative.is_absolute() or '..' in relative.parts:
+            relative = Path(word_path.name)
+        relative = relative.with_suffix('.xlsx')
+        excel_path = self.output_dir / relative
+        excel_path.parent.mkdir(parents=True, exist_ok=True)
+        return {'record': {'file': name, 'output': relative.as_posix(),
+                           'input_bytes': input_bytes, 'tables': 0, 'rows': 0,
+                           'seconds': 0.0, 'status': 'error', 'error': ''},
+                'stats': {}, 'excel_path': excel_path, 'store': None, 'key': None,
+                'started': time.perf_counter()}
+    
+    def extract(self, word_path, input_bytes, source=None):
+        """Прва фаза: кеш, учитавање и извлачење редова; враћа посао за упис"""
+        job = self._new_job(word_path, input_bytes)
+        excel_path = job['excel_path']
+        source = word_path if source is None else source
+        profiling = False
+        try:
+            # Дупликат већ конвертованог документа се узима из кеша
+            if self.cache and self.master is None:
+                job['key'] = self.cache.key(source, self.settings)
+                # Бази су потребни редови, па се уз њу кеш само допуњује
+                cached = None if self.database else self.cache.fetch(job['key'], excel_path)
+                if cached is not None:
+                    job['stats'].update(cached)
+                    job['record']['status'] = 'cached'
+                    job['message'] = (f"Из кеша: {job['record']['file']} → "
+                                      f"{job['record']['output']}")
+                    return job
+            if self.profiler:
+                self.profiler.begin_file(word_path.name)
+                profiling = True
+            job['store'] = self.converter.extract(source, job['stats'], self.profiler)
+        except Exception as e:
+            self._fail(job, e)
+            # Упис се неће обавити, па се извештај неуспеле датотеке затвара одмах
+            if profiling:
+                self.profiler.end_file()
+        return job
+    
+    def write(self, job):
+        """Друга фаза: упис радне свеске (или листа главне радне свеске)"""
+        record = job['record']
+        if job['store'] is not None:
+            store = job['store']
+            job['store'] = None
+            try:
+                # У режиму додавања редови документа постају нов лист главне радне свеске
+                if self.master is not None:
+                    record['output'] = self.master.append(Path(record['file']).stem, store,
+                                                          record['file'])
+                    record['status'] = 'ok'
+                    job['message'] = (f"Додато: {record['file']} → {self.master.path.name} "
+                                      f"[{record['output']}]")
+                elif write_excel_atomic(store, job['excel_path'], self.profiler,
+                                        self.converter):
+                    if self.cache:
+                        self.cache.store(job['key'], job['excel_path'], job['stats'])
+                    record['status'] = 'ok'
+                    job['message'] = f"Конвертовано: {record['file']} → {record['output']}"
+                else:
+                    record['error'] = 'чување није успело'
+                if self.database is not None and record['status'] == 'ok':
+                    self.database.add(record['file'], store, record['output'])
+            except Exception as e:
+                self._fail(job, e)
+            finally:
+                if self.profiler:
+                    self.profiler.end_file()
+        self.finish(job)
+    
+    def _fail(self, job, error):
+        job['record']['status'] = 'error'
+        job['record']['error'] = str(error)
+        job['message'] = f"Грешка при конвертовању {job['record']['file']}: {str(error)}"
+    
+    def finish(self, job):
+        """Завршетак датотеке: запис за манифест, закуп и напредак"""
+        record, stats = job['record'], job['stats']
+        record['seconds'] = round(time.perf_counter() - job['started'], 4)
+        record['tables'] = stats.get('tables', 0)
+        record['rows'] = stats.get('rows', 0)
+        for key in ('table_rows', 'amount_rows', 'unparsed_amounts', 'amount_total',
+                    'style_cache_hit'):
+            if key in stats:
+                record[key] = stats[key]
+        self.records.append(record)
+        if self.leases:
+            if record['status'] in ('ok', 'cached'):
+                self.leases.complete(record['file'], record)
+            else:
+                self.leases.release(record['file'])
+        if job.get('message'):
+            self.progress.message(job['message'])
+        self.progress.update(record['input_bytes'], record['rows'])
+    
+    def run(self, docx_files, sizes):
+        """Секвенцијална обрада: извлачење и упис једне датотеке па следеће"""
+        for word_path in docx_files:
+            if not self.claim(word_path):
+                self.skip(word_path, sizes[word_path])
+                continue
+            self.write(self.extract(word_path, sizes[word_path]))
+    
+    def run_pipelined(self, docx_files, sizes, depth=2):
+        """Проточна обрада са ограниченим редовима чекања
+        
+        Нит за претходно читање учитава наредне датотеке у меморију, главна нит
+        извлачи редове, а нит за упис форматира, чува и компресује радне свеске,
+        тако да се чекање на диск и мрежу прикрива извлачењем.
+        """
+        read_queue = queue.Queue(maxsize=depth)
+        write_queue = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+        
+        def put(target, item):
+            # Стављање у ред које се прекида ако је обрада заустављена
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def get(source):
+            # Узимање из реда које се прекида ако је обрада заустављена
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return None
+        
+        def prefetch():
+            try:
+                for word_path in docx_files:
+                    if stop.is_set():
+                        break
+                    if not self.claim(word_path):
+                        put(read_queue, ('skip', word_path, None))
+                        continue
+                    try:
+                        data = word_path.read_bytes()
+                    except OSError as e:
+                        data = e
+                    if not put(read_queue, ('file', word_path, data)):
+                        break
+            finally:
+                put(read_queue, None)
+        
+        # Грешка нити за упис се преноси главној нити после заустављања обраде
+        errors = []
+        
+        def writer():
+            try:
+                while True:
+                    item = write_queue.get()
+                    if item is None:
+                        break
+                    kind, payload = item
+                    if kind == 'skip':
+                        self.skip(payload, sizes[payload])
+                    else:
+                        self.write(payload)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        
+        reader_thread = threading.Thread(target=prefetch, daemon=True)
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        reader_thread.start()
+        writer_thread.start()
+        try:
+            while True:
+                item = get(read_queue)
+                if item is None:
+                    break
+                kind, word_path, data = item
+                if kind == 'skip':
+                    item = ('skip', word_path)
+                elif isinstance(data, OSError):
+                    job = self._new_job(word_path, sizes[word_path])
+                    self._fail(job, data)
+                    item = ('job', job)
+                else:
+                    item = ('job', self.extract(word_path, sizes[word_path], data))
+                if not put(write_queue, item):
+                    break
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            # Нит за упис завршава послове који су већ у реду (ако није пала)
+            while writer_thread.is_alive():
+                try:
+                    write_queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            writer_thread.join()
+            stop.set()
+            reader_thread.join()
+        if errors:
+            raise errors[0]
+
+# Функција која враћа величину датотеке или 0 ако није доступна
+# (недоступна датотека се пријављује као грешка при обради, као и остале)
+def file_size(path):
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
 # Главни део програма
 # Проналази све Word документе у тренутном директоријуму и конвертује их у Excel
-if __name__ == "__main__":
-    # Добијање тренутног директоријума
-    current_dir = Path('.')
+def main(argv=None):
+    args = parse_args(argv)
+    if args.append and args.work_dir:
+        print("Режим додавања (--append) није могуће комбиновати са --work-dir.")
+        exit(1)
+    # Унос у базу је једна трансакција, која би блокирала остале раднике
+    if args.sqlite and args.work_dir:
+        print("Унос у SQLite базу (--sqlite) није могуће комбиновати са --work-dir.")
+        exit(1)
+    
+    # Претрага постојеће базе
+    if args.search is not None:
+        if not args.sqlite:
+            print("Претрага (--search) захтева базу задату са --sqlite.")
+            exit(1)
+        database = RowDatabase(args.sqlite)
+        try:
+            for file, row, col, text, amount in database.search(args.search):
+                text = text.replace('\n', ' ')
+                print(f"{file} [ред {row}, колона {col}]: {text}")
+        finally:
+            database.close()
+        return
+    
+    row_filter = row_filter_from_args(args)
+    compresslevel = compresslevel_from_args(args)
+    
+    # Поређење две ревизије; хешеви редова се чувају у кешу ако је задат
+    if args.diff:
+        converter = Converter(args.fast_load, nested=args.nested, row_filter=row_filter)
+        # Компресија не утиче на редове, па не улази у кључ кеша хешева
+        settings = dict(conversion_settings(args), compresslevel=None)
+        started = time.perf_counter()
+        cache = output_cache_from_args(args)
+        old, old_cached = load_row_hashes(args.diff[0], converter, cache, settings)
+        new, new_cached = load_row_hashes(args.diff[1], converter, cache, settings)
+        changes = diff_rows(old, new)
+        try:
+            counts = write_diff(args.diff_output, *args.diff, changes)
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        if args.diff_output:
+            cached = sum((old_cached, new_cached))
+            print(f"Додато {counts['added']}, уклоњено {counts['removed']}, измењено "
+                  f"{counts['changed']} редова → {args.diff_output} "
+                  f"({time.perf_counter() - started:.2f} с, из кеша {cached}/2)")
+        return
+    
+    # Режим цеви: без приказа напретка и без уписа на диск
+    if args.files == ['-']:
+        try:
+            converter = Converter(args.fast_load, nested=args.nested, row_filter=row_filter,
+                                  compresslevel=compresslevel)
+            if not convert_stream(sys.stdin.buffer, sys.stdout.buffer, args.format, converter):
+                exit(1)
+        except BrokenPipeError:
+            # Читалац је затворио цев (нпр. head) – тихи излаз
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except Exception as e:
+            print(f"Грешка при конвертовању: {str(e) or type(e).__name__}", file=sys.stderr)
+            exit(1)
+        return
+    
+    # Добијање улазног директоријума
+    current_dir = Path(args.input)
     # Креирање излазног директоријума ако не постоји
-    output_dir = current_dir / 'ex'
-    output_dir.mkdir(exist_ok=True)
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Проналажење свих .docx датотека
-    docx_files = list(current_dir.glob('*.docx'))
+    # Проналажење свих .docx датотека (или само задатих)
+    if args.files:
+        docx_files = [Path(name) for name in args.files]
+    else:
+        docx_files = sorted(current_dir.glob('*.docx'))
     
     if not docx_files:
         print("Нема .docx датотека у тренутном директоријуму!")
@@ -269,15 +2607,69 @@ if __name__ == "__main__":
         
     print(f"Пронаћено {len(docx_files)} Word датотека за обраду...")
     
-    for word_path in docx_files:
+    sizes = {word_path: file_size(word_path) for word_path in docx_files}
+    progress = Progress(len(docx_files), sum(sizes.values()), enabled=not args.no_progress)
+    
+    cache = output_cache_from_args(args)
+    settings = conversion_settings(args)
+    profiler = MemoryProfiler() if args.profile_memory else None
+    master = MasterWorkbook(args.append) if args.append else None
+    database = RowDatabase(args.sqlite) if args.sqlite else None
+    style_cache = StyleCache(args.style_cache) if args.style_cache else STYLE_CACHE
+    converter = Converter(args.fast_load, style_cache, args.jobs, args.nested, row_filter,
+                          compresslevel)
+    
+    # Проточна обрада није могућа уз профилисање (мерење се обавља по фазама у једној нити)
+    pipelined = args.pipeline and profiler is None
+    if args.pipeline and not pipelined:
+        print("Проточна обрада је искључена због профилисања меморије.")
+    
+    # Координација са другим радницима само ако је задат радни директоријум
+    coordination = (WorkLeases(args.work_dir, args.lease_ttl, args.worker_id)
+                    if args.work_dir else contextlib.nullcontext())
+    
+    with coordination as leases:
+        batch = Batch(output_dir, progress, cache, settings, profiler, master, leases,
+                      converter, database, current_dir)
+        records = batch.records
         try:
-            # Креирање излазне путање са истим именом али .xlsx екстензијом у 'ex' фолдеру
-            excel_path = output_dir / f"{word_path.stem}.xlsx"
-            
-            success = word_to_excel(word_path, excel_path)
-            if success:
-                print(f"Конвертовано: {word_path.name} → {excel_path.name}")
-        except Exception as e:
-            print(f"Грешка при конвертовању {word_path.name}: {str(e)}")
+            if pipelined:
+                batch.run_pipelined(docx_files, sizes, args.pipeline)
+            else:
+                batch.run(docx_files, sizes)
+        finally:
+            progress.clear()
+            # Манифест се уписује и када је обрада прекинута
+            if args.manifest:
+                write_manifest(args.manifest, records)
+            if profiler:
+                profiler.close()
+                profiler.write(args.profile_memory)
+            style_cache.save()
+            # Ћелије већ обрађених датотека се потврђују и када је обрада прекинута
+            if database:
+                database.close()
+    
+    print(progress.status_line())
+    # Најспорије датотеке ради лакшег уочавања одступања
+    slowest = sorted(records, key=lambda r: r['seconds'], reverse=True)[:3]
+    if len(records) > 1:
+        print("Најспорије датотеке: " + ", ".join(f"{r['file']} ({r['seconds']:.2f} с)" for r in slowest))
+    if args.summary:
+        grand = write_summary(args.summary, records)
+        print(f"Збир износа: {grand[4]:,.2f} ({grand[2]} износа, {grand[3]} непрепознатих) → {args.summary}")
+    if cache:
+        print(cache.summary())
+    print(style_cache.summary())
+    if database:
+        print(database.summary())
+    if profiler:
+        print(profiler.summary())
     
-    print("\nОбрада завршена! Проверите директоријум 'ex' за излазне датотеке.")
+    if master:
+        print(f"\nОбрада завршена! Листови су додати у '{master.path}'.")
+    else:
+        print(f"\nОбрада завршена! Проверите директоријум '{output_dir}' за излазне датотеке.")
+
+if __name__ == "__main__":
+    main()